@@ -1,4 +1,4 @@
-from flask import Flask, request, render_template, jsonify
+from flask import Flask, request, render_template, jsonify, Response
 import os
 import sys
 import traceback
@@ -80,6 +80,9 @@ except ImportError as e:
                     return pd.DataFrame(data_dict)
             
             class MockPredictPipeline:
+                def __init__(self, **kwargs):
+                    pass
+                    
                 def predict(self, df):
                     # Mock prediction based on reading and writing scores
                     reading = df['reading_score'].iloc[0]
@@ -94,68 +97,117 @@ except ImportError as e:
             PredictPipeline = MockPredictPipeline
             print("⚠️ Using mock ML classes for development")
 
+from src.exception import CustomException
+from src.metrics import record_request, record_error, render_metrics, stage_timer
+from src.profiling import RequestProfiler
+from src.pipeline.drift_monitor import DriftMonitor
+from src.page_cache import PageCache
+from src.pipeline.model_router import ModelRouter, ModelRouterConfig
+
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-123')
 
 # Store predictions (in production use database)
 predictions = []
+# Bumped on every new prediction so the cached dashboard knows it is stale
+history_version = 0
+
+# Rendered pages, revalidated against template mtime and history_version
+page_cache = PageCache()
+
+def record_prediction(prediction_data):
+    """Add a prediction to the history, keeping the last 20"""
+    global history_version
+    predictions.append(prediction_data)
+    if len(predictions) > 20:
+        predictions.pop(0)
+    history_version += 1
+
+def error_type(e):
+    """Name of the original exception behind any CustomException wrapping"""
+    while isinstance(e, CustomException) and e.__context__ is not None:
+        e = e.__context__
+    return type(e).__name__
+
+# Opt-in request profiling, off unless PROFILING_TOKEN is set
+profiler = RequestProfiler()
+
+# Live input/prediction sketches compared against artifacts/reference_stats.json
+drift_monitor = DriftMonitor()
+
+# Champion model for /api/predict, plus a challenger when CHALLENGER_ARTIFACTS_DIR is set.
+# A shadow challenger stays out of /metrics so each request's stages are counted once.
+challenger_dir = ModelRouterConfig.challenger_artifacts_dir
+model_router = ModelRouter(
+    PredictPipeline(),
+    PredictPipeline(artifacts_dir=challenger_dir,
+                    record_metrics=ModelRouterConfig.challenger_mode != 'shadow') if challenger_dir else None
+)
 
 @app.route('/')
 def home():
     """Simple home page"""
-    return render_template('index.html')
+    return page_cache.response('index.html')
 
 @app.route('/predict', methods=['GET', 'POST'])
 def predict():
     """Handle predictions"""
     if request.method == 'GET':
-        return render_template('predict.html')
+        return page_cache.response('predict.html')
     
+    record_request('predict')
     try:
-        # Get form data
-        gender = request.form.get('gender')
-        race_ethnicity = request.form.get('ethnicity')
-        parental_education = request.form.get('parental_level_of_education')
-        lunch = request.form.get('lunch')
-        test_prep = request.form.get('test_preparation_course')
-        reading_score = request.form.get('reading_score')
-        writing_score = request.form.get('writing_score')
-        
-        # Basic validation
-        if not all([gender, race_ethnicity, parental_education, lunch, test_prep, reading_score, writing_score]):
-            return render_template('predict.html', error="Please fill all fields")
-        
-        # Convert scores to float with validation
-        try:
-            reading_score_float = float(reading_score)
-            writing_score_float = float(writing_score)
+        with stage_timer('validation'):
+            # Get form data
+            gender = request.form.get('gender')
+            race_ethnicity = request.form.get('ethnicity')
+            parental_education = request.form.get('parental_level_of_education')
+            lunch = request.form.get('lunch')
+            test_prep = request.form.get('test_preparation_course')
+            reading_score = request.form.get('reading_score')
+            writing_score = request.form.get('writing_score')
             
-            if not (0 <= reading_score_float <= 100) or not (0 <= writing_score_float <= 100):
-                return render_template('predict.html', error="Scores must be between 0 and 100")
+            # Basic validation
+            if not all([gender, race_ethnicity, parental_education, lunch, test_prep, reading_score, writing_score]):
+                record_error('predict', 'missing_field')
+                return render_template('predict.html', error="Please fill all fields")
+            
+            # Convert scores to float with validation
+            try:
+                reading_score_float = float(reading_score)
+                writing_score_float = float(writing_score)
                 
-        except ValueError:
-            return render_template('predict.html', error="Please enter valid numbers for scores")
+                if not (0 <= reading_score_float <= 100) or not (0 <= writing_score_float <= 100):
+                    record_error('predict', 'score_out_of_range')
+                    return render_template('predict.html', error="Scores must be between 0 and 100")
+                    
+            except ValueError:
+                record_error('predict', 'invalid_score')
+                return render_template('predict.html', error="Please enter valid numbers for scores")
         
         # Check if CustomData is available
         if CustomData is None:
+            record_error('predict', 'model_not_loaded')
             return render_template('predict.html', error="ML model not loaded. Please check server logs.")
         
-        # Create data object
-        data = CustomData(
-            gender=gender,
-            race_ethnicity=race_ethnicity,
-            parental_level_of_education=parental_education,
-            lunch=lunch,
-            test_preparation_course=test_prep,
-            reading_score=reading_score_float,
-            writing_score=writing_score_float
-        )
-        
-        # Get prediction
-        df = data.get_data_as_data_frame()
+        with stage_timer('dataframe'):
+            # Create data object
+            data = CustomData(
+                gender=gender,
+                race_ethnicity=race_ethnicity,
+                parental_level_of_education=parental_education,
+                lunch=lunch,
+                test_preparation_course=test_prep,
+                reading_score=reading_score_float,
+                writing_score=writing_score_float
+            )
+            
+            # Get prediction
+            df = data.get_data_as_data_frame()
         print(f"📊 Data for prediction: {df.to_dict()}")
         
         if PredictPipeline is None:
+            record_error('predict', 'model_not_loaded')
             return render_template('predict.html', error="Prediction pipeline not loaded.")
         
         pipeline = PredictPipeline()
@@ -164,27 +216,36 @@ def predict():
         # Ensure result is within bounds
         result = max(0, min(100, float(result)))
         
-        # Store prediction with timestamp
-        prediction_data = {
-            'score': round(float(result), 1),
-            'category': get_category(float(result)),
-            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'reading': reading_score_float,
-            'writing': writing_score_float,
-            'gender': gender,
-            'ethnicity': race_ethnicity
-        }
-        predictions.append(prediction_data)
-        
-        # Keep only last 20 predictions
-        if len(predictions) > 20:
-            predictions.pop(0)
+        with stage_timer('history'):
+            # Store prediction with timestamp
+            prediction_data = {
+                'score': round(float(result), 1),
+                'category': get_category(float(result)),
+                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'reading': reading_score_float,
+                'writing': writing_score_float,
+                'gender': gender,
+                'ethnicity': race_ethnicity
+            }
+            record_prediction(prediction_data)
+            
+            drift_monitor.update({
+                'gender': gender,
+                'race_ethnicity': race_ethnicity,
+                'parental_level_of_education': parental_education,
+                'lunch': lunch,
+                'test_preparation_course': test_prep,
+                'reading_score': reading_score_float,
+                'writing_score': writing_score_float
+            }, result)
         
-        return render_template('predict.html', 
-                             result=round(float(result), 1),
-                             category=get_category(float(result)))
+        with stage_timer('render'):
+            return render_template('predict.html', 
+                                 result=round(float(result), 1),
+                                 category=get_category(float(result)))
         
     except Exception as e:
+        record_error('predict', error_type(e))
         error_msg = f"Error: {str(e)}"
         print(f"🔥 Prediction error: {error_msg}")
         traceback.print_exc()
@@ -193,76 +254,85 @@ def predict():
 @app.route('/dashboard')
 def dashboard():
     """Simple dashboard"""
-    if predictions:
-        avg_score = sum(p['score'] for p in predictions) / len(predictions)
-    else:
-        avg_score = 0
+    def context():
+        if predictions:
+            avg_score = sum(p['score'] for p in predictions) / len(predictions)
+        else:
+            avg_score = 0
+        return dict(predictions=predictions[-10:][::-1],  # Last 10, newest first
+                    total=len(predictions),
+                    avg_score=round(avg_score, 1))
     
-    return render_template('dashboard.html',
-                         predictions=predictions[-10:][::-1],  # Last 10, newest first
-                         total=len(predictions),
-                         avg_score=round(avg_score, 1))
+    return page_cache.response('dashboard.html', version=history_version, context=context)
 
 @app.route('/api/predict', methods=['POST'])
+@profiler.wrap
 def api_predict():
     """JSON API for predictions"""
+    record_request('api_predict')
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'success': False, 'error': 'No data provided'}), 400
-        
-        # Validate required fields
-        required_fields = ['gender', 'race_ethnicity', 'parental_level_of_education', 
-                          'lunch', 'test_preparation_course', 'reading_score', 'writing_score']
-        
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'success': False, 'error': f'Missing field: {field}'}), 400
-        
-        # Validate scores
-        try:
-            reading_score = float(data['reading_score'])
-            writing_score = float(data['writing_score'])
-            if not (0 <= reading_score <= 100) or not (0 <= writing_score <= 100):
-                return jsonify({'success': False, 'error': 'Scores must be between 0 and 100'}), 400
-        except ValueError:
-            return jsonify({'success': False, 'error': 'Invalid score values'}), 400
+        with stage_timer('validation'):
+            data = request.get_json()
+            
+            if not data:
+                record_error('api_predict', 'no_data')
+                return jsonify({'success': False, 'error': 'No data provided'}), 400
+            
+            # Validate required fields
+            required_fields = ['gender', 'race_ethnicity', 'parental_level_of_education', 
+                              'lunch', 'test_preparation_course', 'reading_score', 'writing_score']
+            
+            for field in required_fields:
+                if field not in data:
+                    record_error('api_predict', 'missing_field')
+                    return jsonify({'success': False, 'error': f'Missing field: {field}'}), 400
+            
+            # Validate scores
+            try:
+                reading_score = float(data['reading_score'])
+                writing_score = float(data['writing_score'])
+                if not (0 <= reading_score <= 100) or not (0 <= writing_score <= 100):
+                    record_error('api_predict', 'score_out_of_range')
+                    return jsonify({'success': False, 'error': 'Scores must be between 0 and 100'}), 400
+            except ValueError:
+                record_error('api_predict', 'invalid_score')
+                return jsonify({'success': False, 'error': 'Invalid score values'}), 400
         
         # Check if ML modules are loaded
         if CustomData is None or PredictPipeline is None:
+            record_error('api_predict', 'model_not_loaded')
             return jsonify({'success': False, 'error': 'ML model not loaded'}), 500
         
-        # Create data object
-        custom_data = CustomData(
-            gender=data['gender'],
-            race_ethnicity=data['race_ethnicity'],
-            parental_level_of_education=data['parental_level_of_education'],
-            lunch=data['lunch'],
-            test_preparation_course=data['test_preparation_course'],
-            reading_score=reading_score,
-            writing_score=writing_score
-        )
-        
-        # Get prediction
-        df = custom_data.get_data_as_data_frame()
-        pipeline = PredictPipeline()
-        result = pipeline.predict(df)[0]
+        with stage_timer('dataframe'):
+            # Create data object
+            custom_data = CustomData(
+                gender=data['gender'],
+                race_ethnicity=data['race_ethnicity'],
+                parental_level_of_education=data['parental_level_of_education'],
+                lunch=data['lunch'],
+                test_preparation_course=data['test_preparation_course'],
+                reading_score=reading_score,
+                writing_score=writing_score
+            )
+            
+            # Get prediction
+            df = custom_data.get_data_as_data_frame()
+        result = model_router.predict(df)[0]
         result = max(0, min(100, float(result)))
         category = get_category(result)
         
-        # Store prediction
-        prediction_data = {
-            'score': round(float(result), 1),
-            'category': category,
-            'timestamp': datetime.now().isoformat(),
-            'reading': reading_score,
-            'writing': writing_score
-        }
-        predictions.append(prediction_data)
-        
-        if len(predictions) > 20:
-            predictions.pop(0)
+        with stage_timer('history'):
+            # Store prediction
+            prediction_data = {
+                'score': round(float(result), 1),
+                'category': category,
+                'timestamp': datetime.now().isoformat(),
+                'reading': reading_score,
+                'writing': writing_score
+            }
+            record_prediction(prediction_data)
+            
+            drift_monitor.update(data, result)
         
         # Response messages
         messages = {
@@ -272,15 +342,130 @@ def api_predict():
             'Poor': "Needs practice. Don't give up! 💪"
         }
         
+        with stage_timer('render'):
+            return jsonify({
+                'success': True,
+                'prediction': round(float(result), 1),
+                'performance': category,
+                'message': messages.get(category, ''),
+                'timestamp': prediction_data['timestamp']
+            })
+        
+    except Exception as e:
+        record_error('api_predict', error_type(e))
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Fields a sweep may vary, and the most variants one request may score
+SWEEP_NUMERIC_FIELDS = ('reading_score', 'writing_score')
+SWEEP_CATEGORICAL_FIELDS = ('gender', 'race_ethnicity', 'parental_level_of_education',
+                            'lunch', 'test_preparation_course')
+MAX_SWEEP_VARIANTS = 10000
+
+def parse_sweep_axis(field, spec):
+    """Expand one entry of a sweep's `vary` object into a list of values"""
+    if field in SWEEP_NUMERIC_FIELDS:
+        if isinstance(spec, dict):
+            start = float(spec.get('start', 0))
+            stop = float(spec.get('stop', 100))
+            step = float(spec.get('step', 5))
+            if not (0 <= start <= stop <= 100):
+                raise ValueError(f'{field}: need 0 <= start <= stop <= 100')
+            if not step > 0:
+                raise ValueError(f'{field}: step must be positive')
+            # Size the axis before allocating it; the epsilon keeps `stop` itself
+            steps = (stop - start) / step
+            if not np.isfinite(steps):
+                raise ValueError(f'{field}: step is too small')
+            count = int(np.floor(steps + 1e-9)) + 1
+            if count > MAX_SWEEP_VARIANTS:
+                raise ValueError(f'{field}: sweep exceeds {MAX_SWEEP_VARIANTS} variants')
+            values = np.minimum(start + step * np.arange(count), stop).tolist()
+        elif isinstance(spec, list):
+            if len(spec) > MAX_SWEEP_VARIANTS:
+                raise ValueError(f'{field}: sweep exceeds {MAX_SWEEP_VARIANTS} variants')
+            values = [float(value) for value in spec]
+            if not all(0 <= value <= 100 for value in values):
+                raise ValueError(f'{field}: scores must be between 0 and 100')
+        else:
+            raise ValueError(f'{field}: expected a list or a start/stop/step object')
+    elif field in SWEEP_CATEGORICAL_FIELDS:
+        if not isinstance(spec, list):
+            raise ValueError(f'{field}: expected a list of values')
+        if len(spec) > MAX_SWEEP_VARIANTS:
+            raise ValueError(f'{field}: sweep exceeds {MAX_SWEEP_VARIANTS} variants')
+        values = [str(value) for value in spec]
+    else:
+        raise ValueError(f'Field cannot be varied: {field}')
+    if not values:
+        raise ValueError(f'{field}: no values to sweep')
+    return values
+
+@app.route('/api/predict/sweep', methods=['POST'])
+def api_predict_sweep():
+    """Score a grid of variations around one student in a single model call"""
+    record_request('api_predict_sweep')
+    try:
+        with stage_timer('validation'):
+            data = request.get_json()
+            if not data or not isinstance(data.get('base'), dict) or not isinstance(data.get('vary'), dict):
+                record_error('api_predict_sweep', 'no_data')
+                return jsonify({'success': False, 'error': "Provide 'base' and 'vary' objects"}), 400
+            
+            base = data['base']
+            required_fields = ['gender', 'race_ethnicity', 'parental_level_of_education', 
+                              'lunch', 'test_preparation_course', 'reading_score', 'writing_score']
+            for field in required_fields:
+                if field not in base:
+                    record_error('api_predict_sweep', 'missing_field')
+                    return jsonify({'success': False, 'error': f'Missing field: {field}'}), 400
+            
+            try:
+                reading_score = float(base['reading_score'])
+                writing_score = float(base['writing_score'])
+                if not (0 <= reading_score <= 100) or not (0 <= writing_score <= 100):
+                    record_error('api_predict_sweep', 'score_out_of_range')
+                    return jsonify({'success': False, 'error': 'Scores must be between 0 and 100'}), 400
+                axes = {field: parse_sweep_axis(field, spec) for field, spec in data['vary'].items()}
+            except (TypeError, ValueError) as e:
+                record_error('api_predict_sweep', 'invalid_sweep')
+                return jsonify({'success': False, 'error': str(e)}), 400
+            
+            shape = [len(values) for values in axes.values()]
+            if int(np.prod(shape)) > MAX_SWEEP_VARIANTS:
+                record_error('api_predict_sweep', 'sweep_too_large')
+                return jsonify({'success': False,
+                                'error': f'Sweep exceeds {MAX_SWEEP_VARIANTS} variants'}), 400
+        
+        if CustomData is None or PredictPipeline is None:
+            record_error('api_predict_sweep', 'model_not_loaded')
+            return jsonify({'success': False, 'error': 'ML model not loaded'}), 500
+        
+        # Grid-sized stages are not timed; they would skew the single-row
+        # predict_stage_seconds histogram that /api/predict feeds
+        custom_data = CustomData(
+            gender=base['gender'],
+            race_ethnicity=base['race_ethnicity'],
+            parental_level_of_education=base['parental_level_of_education'],
+            lunch=base['lunch'],
+            test_preparation_course=base['test_preparation_course'],
+            reading_score=reading_score,
+            writing_score=writing_score
+        )
+        df = custom_data.get_sweep_data_frame(axes)
+        
+        # One preprocessor + model call for the whole grid
+        results = np.clip(np.asarray(PredictPipeline(record_metrics=False).predict(df), dtype=float), 0, 100)
+        
         return jsonify({
             'success': True,
-            'prediction': round(float(result), 1),
-            'performance': category,
-            'message': messages.get(category, ''),
-            'timestamp': prediction_data['timestamp']
+            'fields': list(axes),
+            'axes': axes,
+            'shape': shape,
+            'predictions': np.round(results, 1).reshape(shape).tolist()
         })
-        
+    
     except Exception as e:
+        record_error('api_predict_sweep', error_type(e))
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/health')
@@ -293,6 +478,41 @@ def health_check():
         'ml_loaded': CustomData is not None and PredictPipeline is not None
     })
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+@app.route('/models')
+def models_report():
+    """Champion/challenger latency and prediction deltas"""
+    return jsonify(model_router.report())
+
+@app.route('/drift')
+def drift():
+    """Drift of live inputs and predictions against training data"""
+    return jsonify(drift_monitor.report())
+
+@app.route('/admin/profile/stacks')
+def profile_stacks():
+    """Aggregated collapsed stacks from sampled requests"""
+    if not profiler.is_admin():
+        return page_not_found(None)
+    return Response(profiler.collapsed_stacks(), content_type='text/plain; charset=utf-8')
+
+@app.route('/admin/profile/sampling', methods=['POST'])
+def profile_sampling():
+    """Set the percentage of /api/predict requests to sample"""
+    if not profiler.is_admin():
+        return page_not_found(None)
+    data = request.get_json(silent=True) or {}
+    try:
+        percent = profiler.set_sample_percent(data.get('percent', 0))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Invalid percent'}), 400
+    return jsonify({'success': True, 'percent': percent})
+
 @app.route('/debug')
 def debug_info():
     """Debug endpoint to check system info"""
@@ -319,11 +539,11 @@ def get_category(score):
 
 @app.errorhandler(404)
 def page_not_found(e):
-    return render_template('404.html'), 404
+    return page_cache.response('404.html', status=404)
 
 @app.errorhandler(500)
 def internal_error(e):
-    return render_template('500.html'), 500
+    return page_cache.response('500.html', status=500)
 
 # Check for required pickle files
 def check_artifacts():
@@ -354,6 +574,9 @@ if __name__ == '__main__':
     # Check for artifacts
     artifacts_available = check_artifacts()
     
+    # Same as gunicorn's on_starting: a sampling toggle doesn't outlive the server
+    profiler.clear_sample_percent()
+    
     # Run the app
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+
+# Each worker writes its metric samples here so /metrics can merge them.
+# Must be set before the workers import prometheus_client.
+multiproc_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "student-performance-metrics"),
+)
+
+# Drift monitor sketches, one file per worker, merged by /drift
+drift_sketch_dir = os.environ.setdefault(
+    "DRIFT_SKETCH_DIR",
+    os.path.join(tempfile.gettempdir(), "student-performance-drift"),
+)
+
+
+def on_starting(server):
+    # Samples left over from a previous run would be merged into the new one
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+    shutil.rmtree(drift_sketch_dir, ignore_errors=True)
+
+    # A sampling rate set through /admin/profile/sampling lasts until restart;
+    # after that PROFILE_SAMPLE_PERCENT applies again
+    from src.profiling import RequestProfiler
+    RequestProfiler().clear_sample_percent()
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -13,10 +13,13 @@ from src.logger import logging
 import os
 
 from src.utils import save_object
+from src.reference_stats import build_reference_stats
+import json
 
 @dataclass
 class DataTransformationConfig:
     preprocessor_obj_file_path=os.path.join('artifacts',"proprocessor.pkl")
+    reference_stats_file_path=os.path.join('artifacts',"reference_stats.json")
 
 class DataTransformation:
     def __init__(self):
@@ -115,6 +118,12 @@ class DataTransformation:
 
             )
 
+            # Baseline for the live drift monitor
+            with open(self.data_transformation_config.reference_stats_file_path,"w") as file_obj:
+                json.dump(build_reference_stats(input_feature_train_df,target_feature_train_df),file_obj)
+
+            logging.info("Saved drift reference statistics.")
+
             return (
                 train_arr,
                 test_arr,
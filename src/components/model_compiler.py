@@ -0,0 +1,476 @@
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.exception import CustomException
+from src.logger import logging
+
+
+@dataclass
+class ModelCompilerConfig:
+    compiled_model_file_path = os.path.join("artifacts", "compiled_model.npz")
+    trained_model_file_path = os.path.join("artifacts", "model.pkl")
+    preprocessor_file_path = os.path.join("artifacts", "preprocessor.pkl")
+    test_data_path = os.path.join("artifacts", "test.csv")
+    # Batch sizes timed to find where the library's own predict catches up
+    crossover_sizes = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+class CompiledTreeEnsemble:
+    '''
+    Tree ensemble flattened into NumPy node arrays.
+
+    Every tree lives in the same flat arrays and is addressed by its root
+    offset. Leaves point to themselves, so walking `max_depth` steps from
+    the roots lands every row on its leaf without per-node branching.
+
+    The walk does rows x trees x depth work, so it only beats the library's
+    own predict on small batches; `max_rows` is the measured crossover.
+    '''
+
+    def __init__(self, feature, threshold, left, right, default_left, value,
+                 roots, tree_weights, max_depth, base_score=0.0,
+                 aggregation="sum", strict=False, max_rows=0):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.tree_weights = np.asarray(tree_weights, dtype=np.float64)
+        self.max_depth = int(max_depth)
+        self.base_score = float(base_score)
+        self.aggregation = str(aggregation)
+        self.strict = bool(strict)
+        self.max_rows = int(max_rows)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def _leaf_values(self, X):
+        # Rows x trees matrix of node ids, advanced one level per step
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+        rows = np.arange(X.shape[0])[:, None]
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            thr = self.threshold[nodes]
+            go_left = x < thr if self.strict else x <= thr
+            missing = np.isnan(x)
+            if missing.any():
+                go_left = np.where(missing, self.default_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes]
+
+    def _aggregate(self, leaf_values):
+        if self.aggregation == "weighted_median":
+            # Same weighted median as AdaBoostRegressor._get_median_predict
+            sorted_idx = np.argsort(leaf_values, axis=1)
+            weight_cdf = np.cumsum(self.tree_weights[sorted_idx], axis=1)
+            median_or_above = weight_cdf >= 0.5 * weight_cdf[:, -1][:, np.newaxis]
+            median_idx = median_or_above.argmax(axis=1)
+            row_idx = np.arange(leaf_values.shape[0])
+            return leaf_values[row_idx, sorted_idx[row_idx, median_idx]]
+        return self.base_score + leaf_values @ self.tree_weights
+
+    def predict(self, X):
+        try:
+            if hasattr(X, "toarray"):
+                X = X.toarray()
+            X = np.asarray(X)
+            # The libraries evaluate splits on float32 inputs
+            X = X.astype(np.float32, copy=False)
+            if X.ndim == 1:
+                X = X.reshape(1, -1)
+
+            # Bound the rows x trees work matrices to roughly 1M cells
+            block = max(1, (1 << 20) // max(1, self.n_trees))
+            preds = np.empty(X.shape[0], dtype=np.float64)
+            for start in range(0, X.shape[0], block):
+                stop = start + block
+                preds[start:stop] = self._aggregate(self._leaf_values(X[start:stop]))
+            return preds
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def to_dict(self):
+        return {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "left": self.left,
+            "right": self.right,
+            "default_left": self.default_left,
+            "value": self.value,
+            "roots": self.roots,
+            "tree_weights": self.tree_weights,
+            "max_depth": np.array(self.max_depth),
+            "base_score": np.array(self.base_score),
+            "aggregation": np.array(self.aggregation),
+            "strict": np.array(self.strict),
+            "max_rows": np.array(self.max_rows),
+        }
+
+    def save(self, file_path):
+        try:
+            dir_path = os.path.dirname(file_path)
+            os.makedirs(dir_path, exist_ok=True)
+
+            with open(file_path, "wb") as file_obj:
+                np.savez(file_obj, **self.to_dict())
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    @classmethod
+    def load(cls, file_path):
+        try:
+            with np.load(file_path, allow_pickle=False) as data:
+                return cls(
+                    feature=data["feature"],
+                    threshold=data["threshold"],
+                    left=data["left"],
+                    right=data["right"],
+                    default_left=data["default_left"],
+                    value=data["value"],
+                    roots=data["roots"],
+                    tree_weights=data["tree_weights"],
+                    max_depth=data["max_depth"].item(),
+                    base_score=data["base_score"].item(),
+                    aggregation=data["aggregation"].item(),
+                    strict=data["strict"].item(),
+                    max_rows=data["max_rows"].item(),
+                )
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+class _TreeBuffer:
+    '''Accumulates trees into the flat node arrays.'''
+
+    def __init__(self):
+        self.feature = []
+        self.threshold = []
+        self.left = []
+        self.right = []
+        self.default_left = []
+        self.value = []
+        self.roots = []
+        self.max_depth = 0
+
+    def add_sklearn_tree(self, estimator):
+        tree = estimator.tree_
+        offset = len(self.feature)
+        is_leaf = tree.children_left == -1
+        ids = np.arange(tree.node_count) + offset
+
+        self.roots.append(offset)
+        self.feature.extend(np.where(is_leaf, 0, tree.feature))
+        self.threshold.extend(tree.threshold)
+        self.left.extend(np.where(is_leaf, ids, tree.children_left + offset))
+        self.right.extend(np.where(is_leaf, ids, tree.children_right + offset))
+        missing_left = getattr(tree, "missing_go_to_left", np.zeros(tree.node_count))
+        self.default_left.extend(np.asarray(missing_left, dtype=bool))
+        self.value.extend(tree.value[:, 0, 0])
+        self.max_depth = max(self.max_depth, int(tree.max_depth))
+
+    def add_xgboost_tree(self, root, feature_index):
+        offset = len(self.feature)
+        self.roots.append(offset)
+
+        # Pruned trees keep the ids of deleted nodes, so ids are mapped to
+        # compact slots rather than used as offsets directly
+        nodes = []
+        slots = {}
+        stack = [(root, 0)]
+        depth = 0
+        while stack:
+            node, node_depth = stack.pop()
+            slots[node["nodeid"]] = offset + len(nodes)
+            nodes.append(node)
+            depth = max(depth, node_depth)
+            for child in node.get("children", []):
+                stack.append((child, node_depth + 1))
+
+        for node in nodes:
+            if "leaf" in node:
+                slot = slots[node["nodeid"]]
+                self.feature.append(0)
+                self.threshold.append(np.float32(0.0))
+                self.left.append(slot)
+                self.right.append(slot)
+                self.default_left.append(False)
+                self.value.append(float(node["leaf"]))
+            else:
+                self.feature.append(feature_index(node["split"]))
+                self.threshold.append(np.float32(node["split_condition"]))
+                self.left.append(slots[node["yes"]])
+                self.right.append(slots[node["no"]])
+                self.default_left.append(node["missing"] == node["yes"])
+                self.value.append(0.0)
+        self.max_depth = max(self.max_depth, depth)
+
+    def build(self, tree_weights, base_score=0.0, aggregation="sum",
+              strict=False, threshold_dtype=np.float64):
+        return CompiledTreeEnsemble(
+            feature=self.feature,
+            threshold=np.asarray(self.threshold, dtype=threshold_dtype),
+            left=self.left,
+            right=self.right,
+            default_left=self.default_left,
+            value=self.value,
+            roots=self.roots,
+            tree_weights=tree_weights,
+            max_depth=self.max_depth,
+            base_score=base_score,
+            aggregation=aggregation,
+            strict=strict,
+        )
+
+
+class ModelCompiler:
+    def __init__(self):
+        self.model_compiler_config = ModelCompilerConfig()
+
+    @staticmethod
+    def is_supported(model):
+        # A single tree is already cheap to evaluate, so it is left out
+        return type(model).__name__ in (
+            "RandomForestRegressor",
+            "ExtraTreesRegressor",
+            "GradientBoostingRegressor",
+            "AdaBoostRegressor",
+            "XGBRegressor",
+        )
+
+    def compile_model(self, model):
+        '''
+        Flattens a fitted tree model into a CompiledTreeEnsemble
+        '''
+        try:
+            name = type(model).__name__
+            buffer = _TreeBuffer()
+
+            if name in ("RandomForestRegressor", "ExtraTreesRegressor"):
+                for estimator in model.estimators_:
+                    buffer.add_sklearn_tree(estimator)
+                n_trees = len(model.estimators_)
+                return buffer.build(tree_weights=np.full(n_trees, 1.0 / n_trees))
+
+            if name == "GradientBoostingRegressor":
+                for estimator in model.estimators_[:, 0]:
+                    buffer.add_sklearn_tree(estimator)
+                if model.init_ == "zero":
+                    base_score = 0.0
+                elif hasattr(model.init_, "constant_"):
+                    base_score = float(np.ravel(model.init_.constant_)[0])
+                else:
+                    raise ValueError("Only constant init estimators can be compiled")
+                n_trees = model.estimators_.shape[0]
+                return buffer.build(
+                    tree_weights=np.full(n_trees, model.learning_rate),
+                    base_score=base_score,
+                )
+
+            if name == "AdaBoostRegressor":
+                n_trees = len(model.estimators_)
+                for estimator in model.estimators_:
+                    buffer.add_sklearn_tree(estimator)
+                return buffer.build(
+                    tree_weights=model.estimator_weights_[:n_trees],
+                    aggregation="weighted_median",
+                )
+
+            if name == "XGBRegressor":
+                return self._compile_xgboost(model, buffer)
+
+            raise ValueError(f"Model type {name} cannot be compiled")
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def _compile_xgboost(self, model, buffer):
+        booster = model.get_booster()
+        config = json.loads(booster.save_config())
+        learner = config["learner"]
+
+        objective = learner["objective"]["name"]
+        if objective != "reg:squarederror":
+            raise ValueError(f"XGBoost objective {objective} cannot be compiled")
+
+        # Newer releases store base_score as a one-element vector string
+        base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+
+        feature_names = booster.feature_names
+        if feature_names:
+            positions = {feature: i for i, feature in enumerate(feature_names)}
+            feature_index = positions.__getitem__
+        else:
+            feature_index = lambda split: int(split[1:])
+
+        trees = booster.get_dump(dump_format="json")
+        # predict() stops at the early-stopped round when there is one
+        best_iteration = getattr(model, "best_iteration", None)
+        if best_iteration is not None:
+            trees = trees[: best_iteration + 1]
+
+        for tree in trees:
+            buffer.add_xgboost_tree(json.loads(tree), feature_index)
+
+        return buffer.build(
+            tree_weights=np.ones(len(trees)),
+            base_score=base_score,
+            strict=True,
+            threshold_dtype=np.float32,
+        )
+
+    def find_crossover(self, model, compiled, features, repeats=5):
+        '''
+        Largest batch size, growing from 1 row, for which the compiled
+        evaluator is still faster than model.predict. 0 if it never is
+        '''
+        try:
+            sizes = self.model_compiler_config.crossover_sizes
+            timings = self.benchmark(model, compiled, features, sizes=sizes, repeats=repeats)
+            max_rows = 0
+            for size in sizes:
+                if timings[size]["compiled"] >= timings[size]["model"]:
+                    break
+                max_rows = size
+            return max_rows
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def initiate_model_compilation(self, model, features):
+        '''
+        Writes the compiled artifact for `model`, or removes a stale one
+        when the chosen model is not a tree ensemble or the compiled
+        evaluator is not faster on `features` even for a single row.
+
+        Compilation is only a serving speed-up, so a failure is logged and
+        serving stays on model.pkl instead of failing training
+        '''
+        compiled_path = self.model_compiler_config.compiled_model_file_path
+        try:
+            self._remove_artifact()
+
+            if not self.is_supported(model):
+                logging.info(f"{type(model).__name__} is not compiled, serving stays on model.pkl")
+                return None
+
+            compiled = self.compile_model(model)
+            compiled.max_rows = self.find_crossover(model, compiled, features)
+            if not compiled.max_rows:
+                logging.info(f"Compiled {type(model).__name__} is slower than model.predict, not saving it")
+                return None
+
+            compiled.save(compiled_path)
+            logging.info(
+                f"Compiled {type(model).__name__} into {compiled.n_trees} trees "
+                f"({len(compiled.feature)} nodes) at {compiled_path}, "
+                f"used for batches up to {compiled.max_rows} rows"
+            )
+            return compiled_path
+
+        except Exception as e:
+            logging.warning(f"Could not compile {type(model).__name__}, serving stays on model.pkl: {e}")
+            self._remove_artifact()
+            return None
+
+    def _remove_artifact(self):
+        # A partial or out-of-date file must never be picked up by serving
+        compiled_path = self.model_compiler_config.compiled_model_file_path
+        try:
+            if os.path.exists(compiled_path):
+                os.remove(compiled_path)
+        except OSError as e:
+            logging.warning(f"Could not remove {compiled_path}: {e}")
+
+    def check_parity(self, model=None, compiled=None, features=None):
+        '''
+        Compares compiled predictions against model.predict on the test split.
+        Returns the max absolute difference
+        '''
+        try:
+            from src.utils import load_object
+
+            config = self.model_compiler_config
+            if model is None:
+                model = load_object(file_path=config.trained_model_file_path)
+            if compiled is None:
+                compiled = self.compile_model(model)
+            if features is None:
+                test_df = pd.read_csv(config.test_data_path)
+                preprocessor = load_object(file_path=config.preprocessor_file_path)
+                features = preprocessor.transform(test_df.drop(columns=["math_score"]))
+
+            expected = np.asarray(model.predict(features), dtype=np.float64)
+            actual = compiled.predict(features)
+            max_abs_diff = float(np.max(np.abs(expected - actual)))
+            logging.info(f"Compiled model parity: max abs diff {max_abs_diff:.3e}")
+            return max_abs_diff
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def benchmark(self, model, compiled, features, sizes=(1, 100, 100_000), repeats=5):
+        '''
+        Best-of-`repeats` latency in seconds for model.predict vs the compiled
+        evaluator, per batch size
+        '''
+        try:
+            features = np.asarray(features.toarray() if hasattr(features, "toarray") else features)
+            results = {}
+            for size in sizes:
+                batch = features[np.arange(size) % features.shape[0]]
+                timings = {}
+                for label, predict in (("model", model.predict), ("compiled", compiled.predict)):
+                    best = float("inf")
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        predict(batch)
+                        best = min(best, time.perf_counter() - start)
+                    timings[label] = best
+                results[size] = timings
+                logging.info(
+                    f"Benchmark {size} rows: model {timings['model'] * 1e3:.3f} ms, "
+                    f"compiled {timings['compiled'] * 1e3:.3f} ms"
+                )
+            return results
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+if __name__ == "__main__":
+    from src.utils import load_object
+
+    compiler = ModelCompiler()
+    config = compiler.model_compiler_config
+    model = load_object(file_path=config.trained_model_file_path)
+    preprocessor = load_object(file_path=config.preprocessor_file_path)
+    test_df = pd.read_csv(config.test_data_path)
+    features = preprocessor.transform(test_df.drop(columns=["math_score"]))
+
+    # Compiles the model.pkl already in artifacts/ without retraining
+    compiled_path = compiler.initiate_model_compilation(model, features)
+    print(f"Compiled artifact: {compiled_path or 'not written, serving stays on model.pkl'}")
+    if not compiler.is_supported(model):
+        sys.exit(0)
+
+    compiled = compiler.compile_model(model)
+    print(f"Max abs diff vs {type(model).__name__}: {compiler.check_parity(model, compiled, features):.3e}")
+    for size, timings in compiler.benchmark(model, compiled, features).items():
+        print(
+            f"{size:>7} rows  model {timings['model'] * 1e3:10.3f} ms  "
+            f"compiled {timings['compiled'] * 1e3:10.3f} ms  "
+            f"speedup {timings['model'] / timings['compiled']:6.1f}x"
+        )
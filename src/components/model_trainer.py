@@ -18,10 +18,14 @@ from src.exception import CustomException
 from src.logger import logging
 
 from src.utils import save_object, evaluate_models
+from src.components.model_compiler import ModelCompiler
 
 @dataclass
 class ModelTrainerConfig:
     trained_model_file_path = os.path.join("artifacts", "model.pkl")
+    early_stopping_rounds = 20
+    validation_size = 0.2
+    n_jobs = -1
 
 class ModelTrainer:
     def __init__(self):
@@ -57,17 +61,14 @@ class ModelTrainer:
                 "Gradient Boosting": {
                     'learning_rate': [.1, .01, .05, .001],
                     'subsample': [0.6, 0.7, 0.75, 0.8, 0.85, 0.9],
-                    'n_estimators': [8, 16, 32, 64, 128, 256]
                 },
                 "Linear Regression": {},
                 "XGBRegressor": {
                     'learning_rate': [.1, .01, .05, .001],
-                    'n_estimators': [8, 16, 32, 64, 128, 256]
                 },
                 "CatBoosting Regressor": {
                     'depth': [6, 8, 10],
                     'learning_rate': [0.01, 0.05, 0.1],
-                    'iterations': [30, 50, 100]
                 },
                 "AdaBoost Regressor": {
                     'learning_rate': [.1, .01, 0.5, .001],
@@ -75,36 +76,27 @@ class ModelTrainer:
                 }
             }
             
-            # Temporarily remove CatBoost if it's causing issues
-            models_to_try = models.copy()
-            params_to_try = params.copy()
-            
-            # Try without CatBoost first
-            if "CatBoosting Regressor" in models_to_try:
-                del models_to_try["CatBoosting Regressor"]
-                del params_to_try["CatBoosting Regressor"]
-                logging.info("Temporarily removed CatBoost due to compatibility issues")
+            # Boosting rounds are early-stopped up to these caps instead of
+            # being grid points of their own
+            boosting_rounds = {
+                "Gradient Boosting": 256,
+                "XGBRegressor": 256,
+                "CatBoosting Regressor": 100,
+            }
             
             model_report = evaluate_models(
                 X_train=X_train, 
                 y_train=y_train, 
                 X_test=X_test, 
                 y_test=y_test,
-                models=models_to_try, 
-                param=params_to_try
+                models=models, 
+                param=params,
+                boosting_rounds=boosting_rounds,
+                early_stopping_rounds=self.model_trainer_config.early_stopping_rounds,
+                validation_size=self.model_trainer_config.validation_size,
+                n_jobs=self.model_trainer_config.n_jobs
             )
             
-            # Optionally try CatBoost separately
-            try:
-                catboost_model = CatBoostRegressor(verbose=False, allow_writing_files=False)
-                catboost_model.fit(X_train, y_train)
-                y_pred_catboost = catboost_model.predict(X_test)
-                catboost_score = r2_score(y_test, y_pred_catboost)
-                model_report["CatBoosting Regressor"] = catboost_score
-                logging.info(f"CatBoost R2 score: {catboost_score:.4f}")
-            except Exception as e:
-                logging.warning(f"CatBoost failed: {str(e)}")
-            
             # To get best model score from dict
             best_model_score = max(sorted(model_report.values()))
             
@@ -126,6 +118,9 @@ class ModelTrainer:
                 file_path=self.model_trainer_config.trained_model_file_path,
                 obj=best_model
             )
+
+            # Flatten tree models into node arrays for small serving batches
+            ModelCompiler().initiate_model_compilation(best_model, X_test)
             
             predicted = best_model.predict(X_test)
             r2_square = r2_score(y_test, predicted)
@@ -0,0 +1,125 @@
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+except ImportError:
+    Histogram = None
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# Stages of a prediction request, in the order they run
+PREDICT_STAGES = (
+    "validation",
+    "dataframe",
+    "transform",
+    "predict",
+    "history",
+    "render",
+)
+
+# Sub-millisecond buckets; a warm single-row prediction sits well under 10ms
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+METRICS_ENABLED = Histogram is not None
+
+if METRICS_ENABLED:
+    STAGE_SECONDS = Histogram(
+        "predict_stage_seconds",
+        "Time spent in each stage of a prediction request",
+        ["stage"],
+        buckets=LATENCY_BUCKETS,
+    )
+    REQUESTS = Counter(
+        "predict_requests_total",
+        "Prediction requests received",
+        ["endpoint"],
+    )
+    ERRORS = Counter(
+        "predict_errors_total",
+        "Prediction requests that failed",
+        ["endpoint", "error_type"],
+    )
+    ARTIFACT_CACHE = Counter(
+        "artifact_cache_lookups_total",
+        "Model and preprocessor loads served from memory or from disk",
+        ["artifact", "result"],
+    )
+    # Gauges from separate gunicorn workers are merged by taking the max
+    MODEL_VERSION = Gauge(
+        "model_version_timestamp_seconds",
+        "Modification time of the model artifact being served",
+        ["kind"],
+        multiprocess_mode="max",
+    )
+
+    # Children bound once so the hot path skips the label lookup
+    _stage_children = {stage: STAGE_SECONDS.labels(stage) for stage in PREDICT_STAGES}
+
+
+@contextmanager
+def stage_timer(stage):
+    '''
+    Records the wall time of the wrapped block under `stage`
+    '''
+    if not METRICS_ENABLED:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def record_stage(stage, seconds):
+    if METRICS_ENABLED:
+        _stage_children[stage].observe(seconds)
+
+
+def record_request(endpoint):
+    if METRICS_ENABLED:
+        REQUESTS.labels(endpoint).inc()
+
+
+def record_error(endpoint, error_type):
+    if METRICS_ENABLED:
+        ERRORS.labels(endpoint, error_type).inc()
+
+
+def record_cache_lookup(artifact, hit):
+    if METRICS_ENABLED:
+        ARTIFACT_CACHE.labels(artifact, "hit" if hit else "miss").inc()
+
+
+def record_model_version(kind, mtime):
+    if METRICS_ENABLED:
+        MODEL_VERSION.labels(kind).set(mtime)
+
+
+def render_metrics():
+    '''
+    Returns (body, content_type) in Prometheus text format. Under gunicorn,
+    PROMETHEUS_MULTIPROC_DIR makes this aggregate every worker's samples
+    '''
+    if not METRICS_ENABLED:
+        return b"# prometheus_client is not installed\n", CONTENT_TYPE_LATEST
+
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(), CONTENT_TYPE_LATEST
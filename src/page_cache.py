@@ -0,0 +1,60 @@
+import os
+from datetime import datetime, timezone
+
+from flask import current_app, make_response, render_template, request
+
+
+class PageCache:
+    '''
+    Rendered template bytes kept per template, reused until the template
+    file changes or, for data-driven pages, the caller's version moves on.
+    Responses carry an ETag, plus Last-Modified for static pages, so repeat
+    visits get a 304.
+    '''
+
+    def __init__(self):
+        self._entries = {}
+
+    def _template_mtime(self, template_name):
+        path = os.path.join(current_app.root_path, current_app.template_folder, template_name)
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self, template_name, version=None, context=None):
+        '''
+        Returns (etag, last_modified, body), with last_modified None for
+        versioned pages. `context` is a callable so the template's data is
+        only gathered when a render is needed
+        '''
+        mtime = self._template_mtime(template_name)
+        entry = self._entries.get(template_name)
+        if entry is None or entry[0] != (mtime, version):
+            body = render_template(template_name, **(context() if context else {})).encode("utf-8")
+            # Versioned pages hold per-worker data, so the worker is part of the tag
+            tag = f"{template_name}-{mtime}" if version is None else f"{template_name}-{mtime}-{os.getpid()}-{version}"
+            # Static pages date from their template file, the same in every
+            # worker and across restarts. Versioned pages get no date, so
+            # If-Modified-Since can't match another worker's copy
+            last_modified = None
+            if version is None and mtime is not None:
+                last_modified = datetime.fromtimestamp(mtime / 1e9, timezone.utc).replace(microsecond=0)
+            entry = ((mtime, version), tag, last_modified, body)
+            self._entries[template_name] = entry
+        return entry[1], entry[2], entry[3]
+
+    def response(self, template_name, version=None, context=None, status=200):
+        etag, last_modified, body = self.get(template_name, version, context)
+        response = make_response(body, status)
+        response.mimetype = "text/html"
+        if status != 200:
+            # Cached bytes only; a 304 would hide the error status
+            return response
+
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        # Let browsers keep the page but check back every time
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.exception import CustomException
+from src.logger import logging
+from src.pipeline.predict_pipeline import PredictPipeline
+
+FEATURE_COLUMNS = [
+    "gender",
+    "race_ethnicity",
+    "parental_level_of_education",
+    "lunch",
+    "test_preparation_course",
+    "reading_score",
+    "writing_score",
+]
+
+
+@dataclass
+class BatchPredictConfig:
+    chunk_size = 50_000
+    n_workers = os.cpu_count() or 1
+    score_column = "predicted_math_score"
+    category_column = "performance_category"
+
+
+def get_categories(scores):
+    '''Vectorized form of get_category in app.py, same score bands'''
+    return np.select(
+        [scores >= 85, scores >= 70, scores >= 50],
+        ["Excellent", "Good", "Average"],
+        default="Poor",
+    )
+
+
+def _init_worker():
+    # Fills the per-process artifact cache once, before the first chunk
+    PredictPipeline().load_model()
+
+
+def _score_chunk(features):
+    preds = np.asarray(PredictPipeline().predict(features), dtype=np.float64)
+    return np.clip(preds, 0, 100)
+
+
+class BatchPredictor:
+    '''
+    Scores a CSV or Parquet file in chunks on a process pool and appends the
+    results to a CSV in input order. A `<output>.progress` checkpoint lets an
+    interrupted run resume after its last completed chunk.
+    '''
+
+    def __init__(self, chunk_size=None, n_workers=None):
+        self.batch_predict_config = BatchPredictConfig()
+        if chunk_size:
+            self.batch_predict_config.chunk_size = chunk_size
+        if n_workers:
+            self.batch_predict_config.n_workers = n_workers
+
+    def _iter_chunks(self, input_path, skip_chunks):
+        chunk_size = self.batch_predict_config.chunk_size
+        if input_path.endswith((".parquet", ".pq")):
+            import pyarrow.parquet as pq
+
+            batches = pq.ParquetFile(input_path).iter_batches(batch_size=chunk_size)
+            for index, batch in enumerate(batches):
+                if index >= skip_chunks:
+                    yield batch.to_pandas()
+            return
+
+        # Skipped rows are dropped by the CSV reader without building frames
+        skip_rows = range(1, skip_chunks * chunk_size + 1) if skip_chunks else None
+        yield from pd.read_csv(input_path, chunksize=chunk_size, skiprows=skip_rows)
+
+    def _load_checkpoint(self, checkpoint_path, input_path, output_path):
+        if not (os.path.exists(checkpoint_path) and os.path.exists(output_path)):
+            return {"completed_chunks": 0, "rows": 0, "output_bytes": 0}
+
+        with open(checkpoint_path) as file_obj:
+            checkpoint = json.load(file_obj)
+        if (checkpoint["input_path"] != os.path.abspath(input_path)
+                or checkpoint["chunk_size"] != self.batch_predict_config.chunk_size):
+            raise ValueError(
+                f"{checkpoint_path} belongs to a different input or chunk size; "
+                "delete it or pass the original arguments"
+            )
+
+        # Drop rows written after the last checkpoint by an interrupted run
+        with open(output_path, "r+b") as file_obj:
+            file_obj.truncate(checkpoint["output_bytes"])
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint_path, checkpoint):
+        tmp_path = f"{checkpoint_path}.tmp"
+        with open(tmp_path, "w") as file_obj:
+            json.dump(checkpoint, file_obj)
+        os.replace(tmp_path, checkpoint_path)
+
+    def predict_file(self, input_path, output_path):
+        try:
+            config = self.batch_predict_config
+            checkpoint_path = f"{output_path}.progress"
+            checkpoint = self._load_checkpoint(checkpoint_path, input_path, output_path)
+            checkpoint.update(
+                input_path=os.path.abspath(input_path),
+                chunk_size=config.chunk_size,
+            )
+            if checkpoint["completed_chunks"]:
+                logging.info(
+                    f"Resuming {input_path} after chunk {checkpoint['completed_chunks']} "
+                    f"({checkpoint['rows']} rows)"
+                )
+
+            start = time.perf_counter()
+            rows_this_run = 0
+            # Enough chunks in flight to keep every worker busy, no more
+            max_in_flight = config.n_workers * 2
+            pending = []
+
+            with ProcessPoolExecutor(max_workers=config.n_workers, initializer=_init_worker) as executor:
+                chunks = self._iter_chunks(input_path, checkpoint["completed_chunks"])
+                exhausted = False
+                while pending or not exhausted:
+                    while not exhausted and len(pending) < max_in_flight:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            exhausted = True
+                            break
+                        pending.append((chunk, executor.submit(_score_chunk, chunk[FEATURE_COLUMNS])))
+                    if not pending:
+                        break
+
+                    # Writing the oldest chunk first keeps the output in input order
+                    chunk, future = pending.pop(0)
+                    scores = future.result()
+                    chunk = chunk.assign(**{
+                        config.score_column: np.round(scores, 1),
+                        config.category_column: get_categories(scores),
+                    })
+                    write_header = checkpoint["output_bytes"] == 0
+                    with open(output_path, "a" if not write_header else "w", newline="") as file_obj:
+                        chunk.to_csv(file_obj, index=False, header=write_header)
+                        checkpoint["output_bytes"] = file_obj.tell()
+
+                    checkpoint["completed_chunks"] += 1
+                    checkpoint["rows"] += len(chunk)
+                    rows_this_run += len(chunk)
+                    self._save_checkpoint(checkpoint_path, checkpoint)
+
+                    elapsed = time.perf_counter() - start
+                    message = (
+                        f"chunk {checkpoint['completed_chunks']}: {checkpoint['rows']} rows scored, "
+                        f"{rows_this_run / elapsed:,.0f} rows/sec"
+                    )
+                    logging.info(message)
+                    print(message, file=sys.stderr)
+
+            elapsed = time.perf_counter() - start
+            logging.info(f"Batch scoring finished: {checkpoint['rows']} rows in {elapsed:.1f}s")
+            if os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+            return checkpoint["rows"]
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+def main(argv=None):
+    config = BatchPredictConfig()
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file of students offline")
+    parser.add_argument("input_path", help="CSV or Parquet file with the CustomData columns")
+    parser.add_argument("output_path", help="CSV file to write predictions to")
+    parser.add_argument("--chunk-size", type=int, default=config.chunk_size)
+    parser.add_argument("--workers", type=int, default=config.n_workers)
+    args = parser.parse_args(argv)
+
+    BatchPredictor(chunk_size=args.chunk_size, n_workers=args.workers).predict_file(
+        args.input_path, args.output_path
+    )
+
+
+if __name__ == "__main__":
+    main()
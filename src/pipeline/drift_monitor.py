@@ -0,0 +1,228 @@
+import glob
+import json
+import math
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+from src.exception import CustomException
+from src.logger import logging
+from src.reference_stats import (
+    CATEGORICAL_COLUMNS,
+    NUMERIC_COLUMNS,
+    PREDICTION_BINS,
+    SCORE_BINS,
+    score_bin,
+)
+
+OTHER_CATEGORY = "__other__"
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+# Score bins are merged this many at a time for PSI, which is noisy on fine bins
+PSI_BIN_MERGE = 10
+
+
+@dataclass
+class DriftMonitorConfig:
+    reference_stats_file_path = os.path.join("artifacts", "reference_stats.json")
+    # Workers share their sketches through this directory when it is set,
+    # as gunicorn.conf.py does; otherwise each process reports alone
+    sketch_dir = os.environ.get("DRIFT_SKETCH_DIR", "")
+    # How often a worker writes its sketch out while taking traffic
+    flush_interval_seconds = 1.0
+
+
+def _proportions(counts):
+    total = sum(counts)
+    return [count / total for count in counts] if total else [0.0] * len(counts)
+
+
+def _merge_bins(counts, factor=PSI_BIN_MERGE):
+    return [sum(counts[i:i + factor]) for i in range(0, len(counts), factor)]
+
+
+def population_stability_index(expected_counts, actual_counts, floor=1e-4):
+    expected = _proportions(expected_counts)
+    actual = _proportions(actual_counts)
+    return sum(
+        (max(a, floor) - max(e, floor)) * math.log(max(a, floor) / max(e, floor))
+        for e, a in zip(expected, actual)
+    )
+
+
+def histogram_quantiles(counts, quantiles=QUANTILES):
+    '''Quantiles on the 0-100 scale, interpolated inside the matching bin'''
+    total = sum(counts)
+    if not total:
+        return {str(q): None for q in quantiles}
+
+    width = 100 / len(counts)
+    result = {}
+    for q in quantiles:
+        target = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if count and cumulative + count >= target:
+                result[str(q)] = round(width * (index + (target - cumulative) / count), 2)
+                break
+            cumulative += count
+    return result
+
+
+class DriftMonitor:
+    '''
+    Fixed-size sketches of live inputs and predictions. `update` costs O(1)
+    per request; `report` does the comparison against training statistics.
+    Each gunicorn worker keeps its own sketch and, with a sketch_dir, saves
+    it there at most once per flush interval so `report` can merge every
+    worker's counts.
+    '''
+
+    def __init__(self):
+        self.drift_monitor_config = DriftMonitorConfig()
+        self.reference = self._load_reference()
+        self._lock = threading.Lock()
+        self._flushed_at = 0.0
+        self.reset()
+
+    def _load_reference(self):
+        path = self.drift_monitor_config.reference_stats_file_path
+        if not os.path.exists(path):
+            logging.warning(f"No drift reference statistics at {path}")
+            return None
+        try:
+            with open(path) as file_obj:
+                return json.load(file_obj)
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def reset(self):
+        reference_categories = (self.reference or {}).get("categorical", {})
+        with self._lock:
+            self.n = 0
+            # Only training categories get their own counter, the rest share one
+            self.categorical = {
+                column: dict.fromkeys(list(reference_categories.get(column, {})) + [OTHER_CATEGORY], 0)
+                for column in CATEGORICAL_COLUMNS
+            }
+            self.numeric = {column: [0] * SCORE_BINS for column in NUMERIC_COLUMNS}
+            self.prediction = [0] * PREDICTION_BINS
+
+    def update(self, record, prediction):
+        with self._lock:
+            self.n += 1
+            for column in CATEGORICAL_COLUMNS:
+                counts = self.categorical[column]
+                value = str(record[column])
+                counts[value if value in counts else OTHER_CATEGORY] += 1
+            for column in NUMERIC_COLUMNS:
+                self.numeric[column][score_bin(float(record[column]), SCORE_BINS)] += 1
+            self.prediction[score_bin(float(prediction), PREDICTION_BINS)] += 1
+
+        if (self.drift_monitor_config.sketch_dir
+                and time.monotonic() - self._flushed_at >= self.drift_monitor_config.flush_interval_seconds):
+            self._flush()
+
+    def _snapshot(self):
+        with self._lock:
+            return {
+                "n": self.n,
+                "categorical": {column: dict(counts) for column, counts in self.categorical.items()},
+                "numeric": {column: list(counts) for column, counts in self.numeric.items()},
+                "prediction": list(self.prediction),
+            }
+
+    def _flush(self):
+        # Losing one write only delays the merged view; failing the request is worse
+        self._flushed_at = time.monotonic()
+        sketch_dir = self.drift_monitor_config.sketch_dir
+        path = os.path.join(sketch_dir, f"drift-{os.getpid()}.json")
+        # Threads of one worker may flush at once, so each gets its own temp file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(sketch_dir, exist_ok=True)
+            with open(tmp_path, "w") as file_obj:
+                json.dump(self._snapshot(), file_obj)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logging.warning(f"Could not save drift sketch: {e}")
+
+    def _merged_snapshot(self):
+        '''
+        This worker's sketch plus every other worker's last saved one, and
+        how many workers went into it
+        '''
+        own = self._snapshot()
+        sketch_dir = self.drift_monitor_config.sketch_dir
+        if not sketch_dir:
+            return own, 1
+
+        self._flush()
+        own_path = os.path.join(sketch_dir, f"drift-{os.getpid()}.json")
+        merged = own
+        workers = 1
+        for path in glob.glob(os.path.join(sketch_dir, "drift-*.json")):
+            if path == own_path:
+                continue
+            try:
+                with open(path) as file_obj:
+                    sketch = json.load(file_obj)
+            except (OSError, ValueError):
+                continue
+            workers += 1
+            merged["n"] += sketch["n"]
+            for column, counts in sketch["categorical"].items():
+                for key, count in counts.items():
+                    merged["categorical"][column][key] = merged["categorical"][column].get(key, 0) + count
+            for column, counts in sketch["numeric"].items():
+                merged["numeric"][column] = [a + b for a, b in zip(merged["numeric"][column], counts)]
+            merged["prediction"] = [a + b for a, b in zip(merged["prediction"], sketch["prediction"])]
+        return merged, workers
+
+    def report(self):
+        snapshot, workers = self._merged_snapshot()
+        n = snapshot["n"]
+        categorical = snapshot["categorical"]
+        numeric = snapshot["numeric"]
+        prediction = snapshot["prediction"]
+
+        reference = self.reference
+        report = {
+            "worker_pid": os.getpid(),
+            # Workers whose counts are merged in; saved sketches trail by up to a flush interval
+            "workers": workers,
+            "requests": n,
+            "reference_available": reference is not None,
+            "categorical": {},
+            "numeric": {},
+        }
+
+        for column, counts in categorical.items():
+            entry = {"live": counts}
+            if reference is not None and n:
+                expected = reference["categorical"].get(column, {})
+                keys = list(counts)
+                entry["psi"] = round(population_stability_index(
+                    [expected.get(key, 0) for key in keys], [counts[key] for key in keys]
+                ), 4)
+            report["categorical"][column] = entry
+
+        for column, counts in numeric.items():
+            entry = {"live_quantiles": histogram_quantiles(counts)}
+            if reference is not None:
+                entry["reference_quantiles"] = histogram_quantiles(reference["numeric"][column])
+                if n:
+                    entry["psi"] = round(population_stability_index(
+                        _merge_bins(reference["numeric"][column]), _merge_bins(counts)
+                    ), 4)
+            report["numeric"][column] = entry
+
+        report["prediction"] = {"live_histogram": prediction}
+        if reference is not None:
+            report["prediction"]["reference_histogram"] = reference["prediction"]
+            if n:
+                report["prediction"]["psi"] = round(
+                    population_stability_index(reference["prediction"], prediction), 4
+                )
+        return report
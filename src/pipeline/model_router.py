@@ -0,0 +1,199 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from src.logger import logging
+
+
+@dataclass
+class ModelRouterConfig:
+    # No challenger is served or scored unless this points at a bundle
+    challenger_artifacts_dir = os.environ.get("CHALLENGER_ARTIFACTS_DIR", "")
+    # "shadow" scores the challenger off the request thread; "split" lets it answer
+    challenger_mode = os.environ.get("CHALLENGER_MODE", "shadow")
+    challenger_traffic_percent = float(os.environ.get("CHALLENGER_TRAFFIC_PERCENT", "10"))
+    # Shadow requests beyond this backlog are dropped rather than queued
+    max_shadow_backlog = 100
+    latency_window = 1024
+
+
+def _rss_mb():
+    '''Resident memory of this process in MB, where /proc is available'''
+    try:
+        with open("/proc/self/statm") as file_obj:
+            return int(file_obj.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class ModelStats:
+    '''Latency window and counters for one model bundle'''
+
+    def __init__(self, name, latency_window):
+        self.name = name
+        self.latencies = deque(maxlen=latency_window)
+        self.requests = 0
+        self.errors = 0
+        self.load_rss_mb = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(seconds)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def report(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            requests, errors = self.requests, self.errors
+        return {
+            "requests": requests,
+            "errors": errors,
+            "latency_ms": {
+                label: None if value is None else round(value * 1000, 3)
+                for label, value in (
+                    ("p50", _percentile(latencies, 0.5)),
+                    ("p95", _percentile(latencies, 0.95)),
+                    ("p99", _percentile(latencies, 0.99)),
+                )
+            },
+            "load_rss_mb": self.load_rss_mb,
+        }
+
+
+class ModelRouter:
+    '''
+    Serves predictions from a champion pipeline and, when configured, a
+    challenger that either answers a share of requests ("split") or is
+    scored in the background on the same input ("shadow").
+    '''
+
+    def __init__(self, champion, challenger=None):
+        self.model_router_config = ModelRouterConfig()
+        self.champion = champion
+        self.challenger = challenger
+        self.stats = {"champion": ModelStats("champion", self.model_router_config.latency_window)}
+
+        # Running sums for challenger - champion on shadow-scored requests
+        self.delta_count = 0
+        self.delta_sum = 0.0
+        self.delta_abs_sum = 0.0
+        self.delta_abs_max = 0.0
+        self.shadow_dropped = 0
+        self._shadow_pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+        self._warm("champion", champion)
+        if challenger is not None:
+            self.stats["challenger"] = ModelStats("challenger", self.model_router_config.latency_window)
+            self._warm("challenger", challenger)
+            if self.model_router_config.challenger_mode == "shadow":
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-model")
+            logging.info(
+                f"Challenger from {self.model_router_config.challenger_artifacts_dir} "
+                f"in {self.model_router_config.challenger_mode} mode"
+            )
+
+    def _warm(self, name, pipeline):
+        # Loads the bundle up front and notes how much memory it took
+        if not hasattr(pipeline, "load_model"):
+            return
+        before = _rss_mb()
+        try:
+            # Both the pickle for batches and the compiled arrays, when
+            # present, that serve single rows
+            pipeline.load_model()
+            pipeline.load_model(n_rows=1)
+            pipeline.load_preprocessor()
+        except Exception as e:
+            logging.warning(f"Could not preload {name} model: {e}")
+            return
+        after = _rss_mb()
+        if before is not None and after is not None:
+            self.stats[name].load_rss_mb = round(after - before, 2)
+
+    def _timed_predict(self, name, pipeline, features):
+        start = time.perf_counter()
+        try:
+            preds = pipeline.predict(features)
+        except Exception:
+            self.stats[name].record_error()
+            raise
+        self.stats[name].record(time.perf_counter() - start)
+        return preds
+
+    def _shadow(self, features, champion_preds):
+        try:
+            preds = self._timed_predict("challenger", self.challenger, features)
+            deltas = [float(c) - float(p) for c, p in zip(preds, champion_preds)]
+            with self._lock:
+                self.delta_count += len(deltas)
+                self.delta_sum += sum(deltas)
+                self.delta_abs_sum += sum(abs(d) for d in deltas)
+                self.delta_abs_max = max([self.delta_abs_max] + [abs(d) for d in deltas])
+        except Exception as e:
+            logging.warning(f"Shadow challenger prediction failed: {e}")
+        finally:
+            with self._lock:
+                self._shadow_pending -= 1
+
+    def predict(self, features):
+        config = self.model_router_config
+        if (self.challenger is not None and config.challenger_mode == "split"
+                and random.random() * 100 < config.challenger_traffic_percent):
+            try:
+                return self._timed_predict("challenger", self.challenger, features)
+            except Exception as e:
+                # Already counted as a challenger error; the champion answers instead
+                logging.warning(f"Challenger prediction failed, falling back to champion: {e}")
+
+        preds = self._timed_predict("champion", self.champion, features)
+
+        if self._executor is not None:
+            with self._lock:
+                backlogged = self._shadow_pending >= config.max_shadow_backlog
+                if backlogged:
+                    self.shadow_dropped += 1
+                else:
+                    self._shadow_pending += 1
+            if not backlogged:
+                self._executor.submit(self._shadow, features, list(preds))
+        return preds
+
+    def report(self):
+        config = self.model_router_config
+        report = {
+            "worker_pid": os.getpid(),
+            "mode": config.challenger_mode if self.challenger is not None else "champion_only",
+            "models": {name: stats.report() for name, stats in self.stats.items()},
+        }
+        if self.challenger is not None:
+            report["challenger_artifacts_dir"] = config.challenger_artifacts_dir
+            if config.challenger_mode == "split":
+                report["challenger_traffic_percent"] = config.challenger_traffic_percent
+            else:
+                with self._lock:
+                    count = self.delta_count
+                    report["shadow"] = {
+                        "compared": count,
+                        "dropped": self.shadow_dropped,
+                        "mean_delta": round(self.delta_sum / count, 4) if count else None,
+                        "mean_abs_delta": round(self.delta_abs_sum / count, 4) if count else None,
+                        "max_abs_delta": round(self.delta_abs_max, 4),
+                    }
+        return report
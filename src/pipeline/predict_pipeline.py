@@ -1,24 +1,116 @@
 import sys
+import time
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
 from src.exception import CustomException
 from src.utils import load_object
+from src.components.model_compiler import CompiledTreeEnsemble
+from src.metrics import record_cache_lookup, record_model_version, record_stage
 import os
 
 
+# Loaded artifacts keyed by path, reused until the file's mtime changes
+_artifact_cache = {}
+
+
+class _PipelineMetrics:
+    '''
+    Cache lookups, model version and stage timings of one pipeline call,
+    held back until `flush`. A call that fails records nothing, so a
+    fallback to another pipeline doesn't count the request twice
+    '''
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._pending = []
+
+    def _add(self, record, *args):
+        if self.enabled:
+            self._pending.append((record, args))
+
+    def cache_lookup(self, artifact, hit):
+        self._add(record_cache_lookup, artifact, hit)
+
+    def model_version(self, kind, mtime):
+        self._add(record_model_version, kind, mtime)
+
+    @contextmanager
+    def stage(self, stage):
+        start = time.perf_counter()
+        yield
+        self._add(record_stage, stage, time.perf_counter() - start)
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        for record, args in pending:
+            record(*args)
+
+
+def _load_cached(file_path, metrics, loader=load_object):
+    mtime = os.path.getmtime(file_path)
+    cached = _artifact_cache.get(file_path)
+    hit = cached is not None and cached[0] == mtime
+    metrics.cache_lookup(os.path.basename(file_path), hit)
+    if not hit:
+        cached = (mtime, loader(file_path=file_path))
+        _artifact_cache[file_path] = cached
+    return cached[1]
+
+
 class PredictPipeline:
-    def __init__(self):
-        pass
+    def __init__(self, artifacts_dir="artifacts", record_metrics=True):
+        self.artifacts_dir = artifacts_dir
+        # Off for pipelines scored beside the serving one, e.g. a shadow
+        # challenger, so per-stage metrics count each request once
+        self.record_metrics = record_metrics
+
+    def load_model(self, n_rows=None, metrics=None):
+        '''
+        The compiled tree arrays for batches of up to their measured
+        crossover size, model.pkl otherwise
+        '''
+        if metrics is None:
+            metrics = _PipelineMetrics(self.record_metrics)
+            model = self.load_model(n_rows, metrics)
+            metrics.flush()
+            return model
+
+        model_path=os.path.join(self.artifacts_dir,"model.pkl")
+        compiled_model_path=os.path.join(self.artifacts_dir,"compiled_model.npz")
+
+        # Ignore the compiled arrays if model.pkl was replaced since
+        if (n_rows is not None and os.path.exists(compiled_model_path)
+                and os.path.getmtime(compiled_model_path) >= os.path.getmtime(model_path)):
+            compiled=_load_cached(compiled_model_path, metrics, loader=CompiledTreeEnsemble.load)
+            if n_rows <= compiled.max_rows:
+                metrics.model_version("compiled", os.path.getmtime(compiled_model_path))
+                return compiled
+        metrics.model_version("pickle", os.path.getmtime(model_path))
+        return _load_cached(model_path, metrics)
+
+    def load_preprocessor(self, metrics=None):
+        if metrics is None:
+            metrics = _PipelineMetrics(self.record_metrics)
+            preprocessor = self.load_preprocessor(metrics)
+            metrics.flush()
+            return preprocessor
+
+        return _load_cached(os.path.join(self.artifacts_dir,'preprocessor.pkl'), metrics)
 
     def predict(self,features):
         try:
-            model_path=os.path.join("artifacts","model.pkl")
-            preprocessor_path=os.path.join('artifacts','preprocessor.pkl')
-            model=load_object(file_path=model_path)
-            preprocessor=load_object(file_path=preprocessor_path)
-            data_scaled=preprocessor.transform(features)
-            preds=model.predict(data_scaled)
+            # Recorded only once the whole call has succeeded
+            metrics=_PipelineMetrics(self.record_metrics)
+            model=self.load_model(n_rows=len(features), metrics=metrics)
+            preprocessor=self.load_preprocessor(metrics=metrics)
+            with metrics.stage("transform"):
+                data_scaled=preprocessor.transform(features)
+            with metrics.stage("predict"):
+                preds=model.predict(data_scaled)
+            metrics.flush()
             return preds
-        
+
         except Exception as e:
             raise CustomException(e,sys)
 
@@ -64,3 +156,25 @@ class CustomData:
 
         except Exception as e:
             raise CustomException(e, sys)
+
+    def get_sweep_data_frame(self, variations):
+        '''
+        Builds every combination of `variations` (field -> list of values)
+        around this record as one DataFrame, in row-major order of the
+        fields as given
+        '''
+        try:
+            fields = list(variations)
+            axes = [np.asarray(variations[field]) for field in fields]
+            grid = np.meshgrid(*[np.arange(len(axis)) for axis in axes], indexing="ij")
+            n_rows = grid[0].size if grid else 1
+
+            base = self.get_data_as_data_frame().iloc[0]
+            columns = {column: np.repeat(base[column], n_rows) for column in base.index}
+            for field, axis, index in zip(fields, axes, grid):
+                columns[field] = axis[index.ravel()]
+
+            return pd.DataFrame(columns, columns=base.index)
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -0,0 +1,229 @@
+import cProfile
+import glob
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from functools import wraps
+
+from flask import make_response, request
+
+from src.logger import logging
+
+
+@dataclass
+class ProfilingConfig:
+    # Profiling stays off entirely unless an admin token is configured
+    token = os.environ.get("PROFILING_TOKEN", "")
+    profile_dir = os.environ.get("PROFILE_DIR", os.path.join("logs", "profiles"))
+    sample_percent = float(os.environ.get("PROFILE_SAMPLE_PERCENT", "0"))
+    max_files = int(os.environ.get("PROFILE_MAX_FILES", "200"))
+    sample_interval = 0.002
+    # How often each worker re-reads the sampling toggle from disk
+    toggle_refresh_seconds = 5.0
+
+
+def _mtime_or_zero(path):
+    # Another worker may delete the file between glob and stat
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+
+def _collapse_stack(frame):
+    '''Formats a frame chain as a root-first `file:function;...` line'''
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    '''
+    Samples one thread's Python stack on a background thread and counts
+    the collapsed stacks
+    '''
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.counts[_collapse_stack(frame)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.profiling_config = ProfilingConfig()
+        self._sample_percent = self.profiling_config.sample_percent
+        self._toggle_checked_at = 0.0
+        self._toggle_path = os.path.join(self.profiling_config.profile_dir, "sample_percent")
+
+    @property
+    def enabled(self):
+        return bool(self.profiling_config.token)
+
+    def is_admin(self):
+        supplied = request.headers.get("X-Profile-Token") or request.args.get("profile_token")
+        if not (self.enabled and supplied):
+            return False
+        return hmac.compare_digest(supplied, self.profiling_config.token)
+
+    def wrap(self, view):
+        '''
+        Adds profiling to a Flask view. Returns the view untouched when
+        profiling is disabled, so there is no per-request cost
+        '''
+        if not self.enabled:
+            return view
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if self.is_admin():
+                return self._profile_request(view, args, kwargs)
+            sample_percent = self.sample_percent()
+            if sample_percent > 0 and random.random() * 100 < sample_percent:
+                return self._sample_request(view, args, kwargs)
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    def sample_percent(self):
+        # Shared through a file so one toggle reaches every gunicorn worker
+        now = time.monotonic()
+        if now - self._toggle_checked_at >= self.profiling_config.toggle_refresh_seconds:
+            self._toggle_checked_at = now
+            try:
+                with open(self._toggle_path) as file_obj:
+                    self._sample_percent = float(file_obj.read().strip())
+            except (OSError, ValueError):
+                pass
+        return self._sample_percent
+
+    def set_sample_percent(self, percent):
+        percent = min(100.0, max(0.0, float(percent)))
+        os.makedirs(self.profiling_config.profile_dir, exist_ok=True)
+        tmp_path = f"{self._toggle_path}.{os.getpid()}"
+        with open(tmp_path, "w") as file_obj:
+            file_obj.write(str(percent))
+        os.replace(tmp_path, self._toggle_path)
+        self._sample_percent = percent
+        self._toggle_checked_at = time.monotonic()
+        logging.info(f"Request profiling sample rate set to {percent}%")
+        return percent
+
+    def clear_sample_percent(self):
+        '''
+        Drops a toggle left by a previous run so PROFILE_SAMPLE_PERCENT
+        applies again. Called once at server start, before any worker
+        '''
+        try:
+            os.remove(self._toggle_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Could not clear the profiling sample toggle: {e}")
+        self._sample_percent = self.profiling_config.sample_percent
+        self._toggle_checked_at = 0.0
+
+    def _profile_path(self, extension):
+        os.makedirs(self.profiling_config.profile_dir, exist_ok=True)
+        name = f"{request.endpoint}-{time.time_ns()}-{os.getpid()}.{extension}"
+        return os.path.join(self.profiling_config.profile_dir, name)
+
+    def _rotate(self, extension):
+        '''Deletes the oldest profiles past max_files; never raises'''
+        try:
+            paths = sorted(
+                glob.glob(os.path.join(self.profiling_config.profile_dir, f"*.{extension}")),
+                key=_mtime_or_zero,
+            )
+            for path in paths[: max(0, len(paths) - self.profiling_config.max_files)]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        except Exception as e:
+            logging.warning(f"Profile rotation failed: {e}")
+
+    def _profile_request(self, view, args, kwargs):
+        '''
+        cProfile of a single admin-flagged request. The stats summary is
+        added to JSON responses and the raw profile is kept on disk
+        '''
+        profiler = cProfile.Profile()
+        response = make_response(profiler.runcall(view, *args, **kwargs))
+
+        profile_path = self._profile_path("prof")
+        profiler.dump_stats(profile_path)
+        self._rotate("prof")
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(25)
+
+        response.headers["X-Profile-File"] = os.path.basename(profile_path)
+        if response.is_json:
+            data = response.get_json()
+            data["profile"] = {
+                "file": os.path.basename(profile_path),
+                "stats": summary.getvalue(),
+            }
+            response.set_data(json.dumps(data))
+        return response
+
+    def _sample_request(self, view, args, kwargs):
+        sampler = StackSampler(threading.get_ident(), self.profiling_config.sample_interval)
+        sampler.start()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            sampler.stop()
+            # Losing a sample is fine; failing the request it came from is not
+            try:
+                if sampler.counts:
+                    with open(self._profile_path("folded"), "w") as file_obj:
+                        for stack, count in sampler.counts.items():
+                            file_obj.write(f"{stack} {count}\n")
+                    self._rotate("folded")
+            except Exception as e:
+                logging.warning(f"Could not save request sample: {e}")
+
+    def collapsed_stacks(self):
+        '''
+        Merges every sampled request on disk, from all workers, into
+        collapsed-stack text that flamegraph.pl or speedscope can read
+        '''
+        totals = Counter()
+        for path in glob.glob(os.path.join(self.profiling_config.profile_dir, "*.folded")):
+            try:
+                with open(path) as file_obj:
+                    for line in file_obj:
+                        stack, _, count = line.rstrip("\n").rpartition(" ")
+                        if stack:
+                            totals[stack] += int(count)
+            except (OSError, ValueError):
+                continue
+        return "".join(f"{stack} {count}\n" for stack, count in totals.most_common())
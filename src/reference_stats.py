@@ -0,0 +1,36 @@
+import numpy as np
+
+NUMERIC_COLUMNS = ["reading_score", "writing_score"]
+CATEGORICAL_COLUMNS = [
+    "gender",
+    "race_ethnicity",
+    "parental_level_of_education",
+    "lunch",
+    "test_preparation_course",
+]
+# Scores live on 0-100, so fixed-width bins double as the quantile sketch
+SCORE_BINS = 100
+PREDICTION_BINS = 20
+
+
+def score_bin(value, n_bins):
+    return min(max(int(value * n_bins / 100), 0), n_bins - 1)
+
+
+def build_reference_stats(input_df, target):
+    '''
+    Training-time counts the drift monitor compares live traffic against.
+    The target's histogram stands in for the prediction distribution.
+    '''
+    return {
+        "n": int(len(input_df)),
+        "categorical": {
+            column: {str(key): int(count) for key, count in input_df[column].value_counts().items()}
+            for column in CATEGORICAL_COLUMNS
+        },
+        "numeric": {
+            column: np.histogram(input_df[column].clip(0, 100), bins=SCORE_BINS, range=(0, 100))[0].tolist()
+            for column in NUMERIC_COLUMNS
+        },
+        "prediction": np.histogram(np.clip(target, 0, 100), bins=PREDICTION_BINS, range=(0, 100))[0].tolist(),
+    }
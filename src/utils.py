@@ -1,13 +1,17 @@
 import os
+import shutil
 import sys
+import tempfile
 
 import numpy as np 
 import pandas as pd
 import dill
+from joblib import Parallel, delayed
 from sklearn.metrics import r2_score
-from sklearn.model_selection import GridSearchCV
+from sklearn.model_selection import KFold, ParameterGrid, train_test_split
 
 from src.exception import CustomException
+from src.logger import logging
 
 def save_object(file_path, obj):
     try:
@@ -21,31 +25,258 @@ def save_object(file_path, obj):
     except Exception as e:
         raise CustomException(e, sys)
     
-def evaluate_models(X_train, y_train,X_test,y_test,models,param):
+# Argument that sets the number of boosting rounds, per booster
+BOOSTING_ROUNDS_PARAM = {
+    "GradientBoostingRegressor": "n_estimators",
+    "XGBRegressor": "n_estimators",
+    "CatBoostRegressor": "iterations",
+}
+
+# Keeps each candidate on one core while candidates run side by side
+SINGLE_THREAD_PARAMS = {
+    "XGBRegressor": {"n_jobs": 1},
+    "CatBoostRegressor": {"thread_count": 1},
+}
+
+def fit_with_early_stopping(model, X_train, y_train, X_val, y_val, max_rounds, patience):
+    '''
+    Fits a booster for up to `max_rounds` and returns the best round count
+    and its R2 score on the validation split
+    '''
+    name = type(model).__name__
+    rounds_param = BOOSTING_ROUNDS_PARAM[name]
+    model.set_params(**{rounds_param: max_rounds})
+
+    if name == "XGBRegressor":
+        model.set_params(early_stopping_rounds=patience)
+        model.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+        best_rounds = model.best_iteration + 1
+        return best_rounds, r2_score(y_val, model.predict(X_val))
+
+    if name == "CatBoostRegressor":
+        model.fit(X_train, y_train, eval_set=(X_val, y_val),
+                  early_stopping_rounds=patience, use_best_model=True)
+        best_rounds = model.get_best_iteration() + 1
+        return best_rounds, r2_score(y_val, model.predict(X_val))
+
+    # GradientBoostingRegressor has no external eval set, so it is grown
+    # one stage at a time with warm_start and stops once the validation
+    # score has not improved for `patience` stages
+    model.set_params(warm_start=True, n_estimators=1)
+    model.fit(X_train, y_train)
+    y_val_pred = model.predict(X_val)
+    scores = [r2_score(y_val, y_val_pred)]
+    while len(scores) < max_rounds and len(scores) - 1 - int(np.argmax(scores)) < patience:
+        model.set_params(n_estimators=len(scores) + 1)
+        model.fit(X_train, y_train)
+        # Only the new stage is evaluated; earlier ones are already in y_val_pred
+        y_val_pred = y_val_pred + model.learning_rate * model.estimators_[-1, 0].predict(X_val)
+        scores.append(r2_score(y_val, y_val_pred))
+    best_rounds = int(np.argmax(scores)) + 1
+    return best_rounds, scores[best_rounds - 1]
+
+def _copy_model(model, params):
+    # Fresh copy built from get_params; sklearn's clone trips on CatBoost
+    candidate = model.__class__(**model.get_params())
+    candidate.set_params(**params)
+    return candidate
+
+def _score_boosting_candidate(model, params, X_train, y_train, X_val, y_val, max_rounds, patience, single_thread):
+    candidate = _copy_model(model, params)
+    if single_thread:
+        candidate.set_params(**SINGLE_THREAD_PARAMS.get(type(model).__name__, {}))
+
+    best_rounds, score = fit_with_early_stopping(
+        candidate, X_train, y_train, X_val, y_val, max_rounds, patience
+    )
+    return {**params, BOOSTING_ROUNDS_PARAM[type(model).__name__]: best_rounds}, score
+
+class SharedDataset:
+    '''
+    Training arrays written once to .npy files and memory-mapped read-only
+    by every worker. Pickling sends only the file paths, so joblib workers
+    attach to the same pages instead of receiving a copy of the data.
+    '''
+
+    def __init__(self, **arrays):
+        arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+        self.nbytes = sum(array.nbytes for array in arrays.values())
+        self.dir_path = tempfile.mkdtemp(prefix="training-arrays-", dir=self._base_dir(self.nbytes))
+        self.paths = {}
+        self._arrays = None
+        try:
+            for name, array in arrays.items():
+                self.paths[name] = os.path.join(self.dir_path, f"{name}.npy")
+                np.save(self.paths[name], array)
+        except Exception:
+            # Don't leave half-written arrays behind in RAM or on disk
+            self.close()
+            raise
+
+    @staticmethod
+    def _base_dir(nbytes):
+        # /dev/shm is RAM-backed but often small (64 MB under Docker), so
+        # it is only used when the arrays fit with room to spare
+        shm_dir = "/dev/shm"
+        try:
+            if os.path.isdir(shm_dir) and shutil.disk_usage(shm_dir).free > 2 * nbytes:
+                return shm_dir
+        except OSError:
+            pass
+        return tempfile.gettempdir()
+
+    def attach(self):
+        if self._arrays is None:
+            self._arrays = {name: np.load(path, mmap_mode="r") for name, path in self.paths.items()}
+        return self._arrays
+
+    def close(self):
+        self._arrays = None
+        shutil.rmtree(self.dir_path, ignore_errors=True)
+
+    def __getstate__(self):
+        return {"dir_path": self.dir_path, "paths": self.paths, "nbytes": self.nbytes, "_arrays": None}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _worker_memory():
+    '''Current process id and its peak resident memory in MB'''
+    try:
+        import resource
+    except ImportError:  # Windows
+        return os.getpid(), None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    return os.getpid(), peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def _fit_candidate(dataset, model, params, fold, cv, max_rounds, patience, single_thread):
+    '''
+    One search fit in a worker: an early-stopped booster candidate on the
+    shared validation split, or one CV fold of a grid candidate. A failing
+    fit scores NaN, like GridSearchCV's error_score, and its error is
+    returned for the parent to log
+    '''
+    try:
+        arrays = dataset.attach()
+        if max_rounds:
+            params, score = _score_boosting_candidate(
+                model, params, arrays["X_fit"], arrays["y_fit"], arrays["X_val"], arrays["y_val"],
+                max_rounds, patience, single_thread
+            )
+        else:
+            # Folds are recomputed here so only the fold number crosses processes
+            X, y = arrays["X_train"], arrays["y_train"]
+            train_idx, test_idx = list(KFold(n_splits=cv).split(X))[fold]
+            candidate = _copy_model(model, params)
+            candidate.fit(X[train_idx], y[train_idx])
+            score = r2_score(y[test_idx], candidate.predict(X[test_idx]))
+        error = None
+    except Exception as e:
+        score, error = np.nan, f"{type(e).__name__}: {e}"
+    return params, score, _worker_memory(), error
+
+def _refit_model(dataset, model, params, single_thread):
+    try:
+        arrays = dataset.attach()
+        model = _copy_model(model, params)
+        if single_thread:
+            # Refits run side by side too, so they are pinned like the search fits
+            model.set_params(**SINGLE_THREAD_PARAMS.get(type(model).__name__, {}))
+        model.fit(arrays["X_train"], arrays["y_train"])
+        test_model_score = r2_score(arrays["y_test"], model.predict(arrays["X_test"]))
+        error = None
+    except Exception as e:
+        model, test_model_score, error = None, np.nan, f"{type(e).__name__}: {e}"
+    return model, test_model_score, _worker_memory(), error
+
+def evaluate_models(X_train, y_train,X_test,y_test,models,param,boosting_rounds=None,
+                    early_stopping_rounds=20,validation_size=0.2,n_jobs=-1,cv=3):
     try:
         report = {}
+        boosting_rounds = boosting_rounds or {}
+        arrays = dict(X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test)
 
-        for i in range(len(list(models))):
-            model = list(models.values())[i]
-            para=param[list(models.keys())[i]]
+        # One validation split shared by every early-stopped booster
+        if boosting_rounds:
+            X_fit, X_val, y_fit, y_val = train_test_split(
+                X_train, y_train, test_size=validation_size, random_state=42
+            )
+            arrays.update(X_fit=X_fit, y_fit=y_fit, X_val=X_val, y_val=y_val)
 
-            gs = GridSearchCV(model,para,cv=3)
-            gs.fit(X_train,y_train)
+        worker_memory = {}
+        single_thread = n_jobs != 1
 
-            model.set_params(**gs.best_params_)
-            model.fit(X_train,y_train)
+        with SharedDataset(**arrays) as dataset, Parallel(n_jobs=n_jobs) as parallel:
+            logging.info(f"Shared {dataset.nbytes / 1024 / 1024:.1f} MB of training arrays at {dataset.dir_path}")
 
-            #model.fit(X_train, y_train)  # Train model
+            # Every candidate (and CV fold) of every model is its own task
+            tasks = []
+            best_params = {}
+            for name, model in models.items():
+                candidates = list(ParameterGrid(param[name]))
+                if name in boosting_rounds:
+                    tasks += [(name, i, None, boosting_rounds[name]) for i in range(len(candidates))]
+                elif len(candidates) == 1:
+                    # Nothing to choose between, so skip the CV fits
+                    best_params[name] = candidates[0]
+                else:
+                    tasks += [(name, i, fold, None) for i in range(len(candidates)) for fold in range(cv)]
 
-            y_train_pred = model.predict(X_train)
+            results = parallel(
+                delayed(_fit_candidate)(
+                    dataset, models[name], list(ParameterGrid(param[name]))[i],
+                    fold, cv, max_rounds, early_stopping_rounds, single_thread
+                )
+                for name, i, fold, max_rounds in tasks
+            )
 
-            y_test_pred = model.predict(X_test)
+            # Mean score per candidate; ties keep the first, as GridSearchCV does
+            candidate_scores = {}
+            for (name, i, _, _), (params, score, (pid, peak_mb), error) in zip(tasks, results):
+                if error is not None:
+                    logging.warning(f"{name} candidate {params} failed, scored NaN: {error}")
+                entry = candidate_scores.setdefault((name, i), [params, []])
+                entry[1].append(score)
+                worker_memory[pid] = max(worker_memory.get(pid) or 0, peak_mb or 0)
+            best_scores = {}
+            for (name, i), (params, scores) in candidate_scores.items():
+                mean_score = np.mean(scores)
+                if np.isnan(mean_score):
+                    continue
+                if name not in best_scores or mean_score > best_scores[name]:
+                    best_scores[name] = mean_score
+                    best_params[name] = params
+            for name, score in best_scores.items():
+                logging.info(f"{name}: best {best_params[name]} with search R2 {score:.4f}")
+            for name in models:
+                if name not in best_params:
+                    logging.warning(f"Every {name} candidate failed, leaving it out")
 
-            train_model_score = r2_score(y_train, y_train_pred)
+            fitted_names = [name for name in models if name in best_params]
+            refits = parallel(
+                delayed(_refit_model)(dataset, models[name], best_params[name], single_thread)
+                for name in fitted_names
+            )
 
-            test_model_score = r2_score(y_test, y_test_pred)
+        for name, (model, test_model_score, (pid, peak_mb), error) in zip(fitted_names, refits):
+            worker_memory[pid] = max(worker_memory.get(pid) or 0, peak_mb or 0)
+            if error is not None:
+                logging.warning(f"{name} refit with {best_params[name]} failed, leaving it out: {error}")
+                continue
+            # Fitted copies replace the originals, as the in-place fits used to,
+            # with the original threading restored for the final fit and serving
+            thread_params = SINGLE_THREAD_PARAMS.get(type(model).__name__, {})
+            original_params = models[name].get_params()
+            model.set_params(**{key: original_params[key] for key in thread_params})
+            models[name] = model
+            report[name] = test_model_score
 
-            report[list(models.keys())[i]] = test_model_score
+        for pid, peak_mb in sorted(worker_memory.items()):
+            logging.info(f"Training worker {pid}: peak RSS {peak_mb:.1f} MB")
 
         return report
 
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+from app import MAX_SWEEP_VARIANTS, parse_sweep_axis
+
+
+def test_decimal_step_ends_exactly_at_stop():
+    values = parse_sweep_axis("reading_score", {"start": 0, "stop": 100, "step": 0.1})
+
+    assert len(values) == 1001
+    assert values[0] == 0 and values[-1] == 100.0
+
+
+def test_uneven_step_never_overshoots_stop():
+    values = parse_sweep_axis("writing_score", {"start": 0, "stop": 100, "step": 0.7})
+
+    assert len(values) == 143
+    assert max(values) <= 100
+
+
+def test_list_of_scores_is_kept_in_order():
+    assert parse_sweep_axis("reading_score", [90, 10, 50]) == [90.0, 10.0, 50.0]
+    assert parse_sweep_axis("lunch", ["standard", "free/reduced"]) == ["standard", "free/reduced"]
+
+
+@pytest.mark.parametrize("field, spec", [
+    ("reading_score", {"start": 0, "stop": 100, "step": 5e-324}),
+    ("reading_score", {"start": 0, "stop": 100, "step": 100 / MAX_SWEEP_VARIANTS / 2}),
+    ("reading_score", {"start": 0, "stop": 100, "step": 0}),
+    ("reading_score", {"start": 50, "stop": 10}),
+    ("reading_score", {"start": 0, "stop": 120}),
+    ("reading_score", [10, 101]),
+    ("reading_score", "0-100"),
+    ("gender", "female"),
+    ("gender", []),
+    ("math_score", [1, 2]),
+])
+def test_invalid_axes_raise_value_error(field, spec):
+    with pytest.raises(ValueError):
+        parse_sweep_axis(field, spec)
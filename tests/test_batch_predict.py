@@ -0,0 +1,90 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+from src.exception import CustomException
+from src.pipeline import batch_predict
+from src.pipeline.batch_predict import FEATURE_COLUMNS, BatchPredictor
+
+
+def _fake_score_chunk(features):
+    if (features["gender"] == "fail").any():
+        raise RuntimeError("scoring failed")
+    return np.clip(0.5 * features["reading_score"] + 0.5 * features["writing_score"], 0, 100).to_numpy()
+
+
+@pytest.fixture(autouse=True)
+def in_process_scoring(monkeypatch):
+    # Threads instead of processes, so the fake scorer needs no artifacts
+    monkeypatch.setattr(batch_predict, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(batch_predict, "_init_worker", lambda: None)
+    monkeypatch.setattr(batch_predict, "_score_chunk", _fake_score_chunk)
+
+
+def _write_input(path, n_rows, fail_row=None):
+    df = pd.DataFrame({
+        "gender": ["fail" if i == fail_row else "female" for i in range(n_rows)],
+        "race_ethnicity": "group B",
+        "parental_level_of_education": "some college",
+        "lunch": "standard",
+        "test_preparation_course": "none",
+        "reading_score": np.arange(n_rows) * 5 % 100,
+        "writing_score": np.arange(n_rows) * 3 % 100,
+    }, columns=FEATURE_COLUMNS)
+    df.to_csv(path, index=False)
+    return df
+
+
+def test_load_checkpoint_truncates_rows_written_after_it(tmp_path):
+    input_path, output_path = tmp_path / "in.csv", tmp_path / "out.csv"
+    checkpoint_path = tmp_path / "out.csv.progress"
+    _write_input(input_path, 3)
+    output_path.write_bytes(b"a,b\n1,2\n3,4\npartial ro")
+    checkpoint = {"completed_chunks": 2, "rows": 2, "output_bytes": len(b"a,b\n1,2\n3,4\n"),
+                  "input_path": str(input_path.resolve()), "chunk_size": 1}
+    checkpoint_path.write_text(json.dumps(checkpoint))
+
+    loaded = BatchPredictor(chunk_size=1)._load_checkpoint(str(checkpoint_path), str(input_path), str(output_path))
+
+    assert loaded == checkpoint
+    assert output_path.read_bytes() == b"a,b\n1,2\n3,4\n"
+
+
+def test_load_checkpoint_rejects_a_different_chunk_size(tmp_path):
+    input_path, output_path = tmp_path / "in.csv", tmp_path / "out.csv"
+    checkpoint_path = tmp_path / "out.csv.progress"
+    _write_input(input_path, 3)
+    output_path.write_text("")
+    checkpoint_path.write_text(json.dumps({"completed_chunks": 1, "rows": 1, "output_bytes": 0,
+                                           "input_path": str(input_path.resolve()), "chunk_size": 1}))
+
+    with pytest.raises(ValueError):
+        BatchPredictor(chunk_size=2)._load_checkpoint(str(checkpoint_path), str(input_path), str(output_path))
+
+
+def test_interrupted_run_resumes_to_the_same_output(tmp_path):
+    expected_path = tmp_path / "expected.csv"
+    _write_input(tmp_path / "clean.csv", 10)
+    assert BatchPredictor(chunk_size=3, n_workers=1).predict_file(str(tmp_path / "clean.csv"), str(expected_path)) == 10
+
+    # Row 7 sits in the third chunk, so the first run stops after two
+    input_path, output_path = tmp_path / "in.csv", tmp_path / "out.csv"
+    _write_input(input_path, 10, fail_row=7)
+    with pytest.raises(CustomException):
+        BatchPredictor(chunk_size=3, n_workers=1).predict_file(str(input_path), str(output_path))
+    checkpoint = json.loads((tmp_path / "out.csv.progress").read_text())
+    assert checkpoint["completed_chunks"] == 2 and checkpoint["rows"] == 6
+    # A write cut off mid-row by the interruption
+    with open(output_path, "a") as file_obj:
+        file_obj.write("female,group B,some")
+
+    _write_input(input_path, 10)
+    assert BatchPredictor(chunk_size=3, n_workers=1).predict_file(str(input_path), str(output_path)) == 10
+
+    assert output_path.read_text() == expected_path.read_text()
+    assert not (tmp_path / "out.csv.progress").exists()
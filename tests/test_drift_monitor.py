@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.pipeline.drift_monitor import DriftMonitor, histogram_quantiles, population_stability_index
+
+RECORD = {
+    "gender": "female",
+    "race_ethnicity": "group B",
+    "parental_level_of_education": "some college",
+    "lunch": "standard",
+    "test_preparation_course": "none",
+    "reading_score": 72,
+    "writing_score": 74,
+}
+
+
+def test_quantiles_interpolate_inside_bins():
+    uniform = histogram_quantiles([1] * 100)
+    assert uniform["0.1"] == pytest.approx(10.0)
+    assert uniform["0.5"] == pytest.approx(50.0)
+    assert uniform["0.9"] == pytest.approx(90.0)
+
+    single_bin = [0] * 100
+    single_bin[50] = 10
+    assert histogram_quantiles(single_bin, quantiles=(0.5,)) == {"0.5": 50.5}
+
+
+def test_quantiles_of_an_empty_histogram_are_none():
+    assert histogram_quantiles([0] * 20, quantiles=(0.5, 0.9)) == {"0.5": None, "0.9": None}
+
+
+def test_psi_is_zero_for_the_same_distribution_at_any_scale():
+    assert population_stability_index([10, 30, 60], [1, 3, 6]) == pytest.approx(0.0)
+
+
+def test_psi_matches_the_textbook_formula():
+    # (0.9 - 0.5) ln(0.9 / 0.5) + (0.1 - 0.5) ln(0.1 / 0.5)
+    assert population_stability_index([50, 50], [9, 1]) == pytest.approx(0.878890, abs=1e-6)
+
+
+def test_psi_floors_empty_bins_instead_of_dividing_by_zero():
+    assert population_stability_index([1, 0], [0, 1]) > 0
+
+
+def test_report_merges_sketches_saved_by_other_workers(tmp_path):
+    other = DriftMonitor()
+    other.drift_monitor_config.sketch_dir = ""
+    for _ in range(3):
+        other.update(RECORD, 70.0)
+    (tmp_path / "drift-99999.json").write_text(json.dumps(other._snapshot()))
+
+    monitor = DriftMonitor()
+    monitor.drift_monitor_config.sketch_dir = str(tmp_path)
+    monitor.update({**RECORD, "gender": "unseen"}, 40.0)
+    report = monitor.report()
+
+    assert report["workers"] == 2
+    assert report["requests"] == 4
+    assert report["categorical"]["gender"]["live"]["female"] == 3
+    assert sum(report["prediction"]["live_histogram"]) == 4
@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+from sklearn.ensemble import AdaBoostRegressor, GradientBoostingRegressor, RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+from src.components.data_transformation import DataTransformation
+from src.components.model_compiler import CompiledTreeEnsemble, ModelCompiler, _TreeBuffer
+
+ARTIFACTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "artifacts")
+
+
+@pytest.fixture(scope="module")
+def arrays():
+    train_df = pd.read_csv(os.path.join(ARTIFACTS_DIR, "train.csv"))
+    test_df = pd.read_csv(os.path.join(ARTIFACTS_DIR, "test.csv"))
+    preprocessor = DataTransformation().get_data_transformer_object()
+    X_train = preprocessor.fit_transform(train_df.drop(columns=["math_score"]))
+    X_test = preprocessor.transform(test_df.drop(columns=["math_score"]))
+    return X_train, train_df["math_score"].to_numpy(), X_test
+
+
+def _xgboost_model():
+    xgboost = pytest.importorskip("xgboost")
+    return xgboost.XGBRegressor(n_estimators=32)
+
+
+@pytest.mark.parametrize("make_model, atol", [
+    (lambda: RandomForestRegressor(n_estimators=16, random_state=42), 1e-9),
+    (lambda: GradientBoostingRegressor(n_estimators=32, random_state=42), 1e-9),
+    (lambda: AdaBoostRegressor(n_estimators=16, random_state=42), 1e-9),
+    # XGBoost sums leaves in float32
+    (_xgboost_model, 1e-3),
+])
+def test_compiled_predictions_match_model_on_test_csv(arrays, make_model, atol):
+    X_train, y_train, X_test = arrays
+    model = make_model().fit(X_train, y_train)
+
+    compiled = ModelCompiler().compile_model(model)
+
+    np.testing.assert_allclose(compiled.predict(X_test), model.predict(X_test), rtol=0, atol=atol)
+
+
+def test_xgboost_tree_with_pruned_node_ids():
+    # Nodes 3 and 4 were pruned away, so the ids skip from 2 to 5
+    tree = {
+        "nodeid": 0, "split": "f0", "split_condition": 0.5, "yes": 1, "no": 2, "missing": 1,
+        "children": [
+            {"nodeid": 1, "leaf": -1.0},
+            {"nodeid": 2, "split": "f1", "split_condition": 0.5, "yes": 5, "no": 6, "missing": 6,
+             "children": [{"nodeid": 5, "leaf": 2.0}, {"nodeid": 6, "leaf": 3.0}]},
+        ],
+    }
+    buffer = _TreeBuffer()
+    buffer.add_xgboost_tree(tree, lambda split: int(split[1:]))
+    compiled = buffer.build(tree_weights=np.ones(1), strict=True, threshold_dtype=np.float32)
+
+    X = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [np.nan, 1.0], [1.0, np.nan]])
+    np.testing.assert_array_equal(compiled.predict(X), [-1.0, 2.0, 3.0, -1.0, 3.0])
+
+
+def test_saved_artifact_round_trips(arrays, tmp_path):
+    X_train, y_train, X_test = arrays
+    model = RandomForestRegressor(n_estimators=8, random_state=42).fit(X_train, y_train)
+    compiled = ModelCompiler().compile_model(model)
+    compiled.max_rows = 64
+
+    path = str(tmp_path / "compiled_model.npz")
+    compiled.save(path)
+    loaded = CompiledTreeEnsemble.load(path)
+
+    assert loaded.max_rows == 64
+    np.testing.assert_array_equal(loaded.predict(X_test), compiled.predict(X_test))
+
+
+def test_single_decision_tree_is_not_compiled():
+    assert not ModelCompiler.is_supported(DecisionTreeRegressor())
+
+
+def test_compile_failure_keeps_serving_on_pickle(arrays, tmp_path, monkeypatch):
+    X_train, y_train, X_test = arrays
+    model = GradientBoostingRegressor(n_estimators=4, random_state=42).fit(X_train, y_train)
+    # A non-constant init cannot be flattened into the node arrays
+    model.init_ = DecisionTreeRegressor()
+
+    compiler = ModelCompiler()
+    stale_path = tmp_path / "compiled_model.npz"
+    stale_path.write_bytes(b"stale")
+    monkeypatch.setattr(compiler.model_compiler_config, "compiled_model_file_path", str(stale_path))
+
+    assert compiler.initiate_model_compilation(model, X_test) is None
+    assert not stale_path.exists()
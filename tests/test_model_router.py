@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from src.pipeline.model_router import ModelRouter, ModelRouterConfig
+
+
+class FakePipeline:
+    def __init__(self, preds=(50.0,), error=None, gate=None):
+        self.preds = list(preds)
+        self.error = error
+        self.gate = gate
+        self.loaded = []
+
+    def load_model(self, n_rows=None):
+        self.loaded.append(n_rows)
+
+    def load_preprocessor(self):
+        pass
+
+    def predict(self, features):
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        if self.error is not None:
+            raise self.error
+        return self.preds
+
+
+@pytest.fixture
+def mode(monkeypatch):
+    def set_mode(challenger_mode, **overrides):
+        monkeypatch.setattr(ModelRouterConfig, "challenger_mode", challenger_mode)
+        for name, value in overrides.items():
+            monkeypatch.setattr(ModelRouterConfig, name, value)
+    return set_mode
+
+
+def test_split_falls_back_to_champion_when_challenger_fails(mode):
+    mode("split", challenger_traffic_percent=100.0)
+    router = ModelRouter(FakePipeline([42.0]), FakePipeline(error=RuntimeError("broken bundle")))
+
+    assert router.predict(None) == [42.0]
+
+    report = router.report()["models"]
+    assert report["challenger"]["errors"] == 1 and report["challenger"]["requests"] == 0
+    assert report["champion"]["requests"] == 1
+
+
+def test_champion_errors_still_reach_the_caller(mode):
+    mode("split", challenger_traffic_percent=0.0)
+    router = ModelRouter(FakePipeline(error=RuntimeError("no model")), FakePipeline())
+
+    with pytest.raises(RuntimeError):
+        router.predict(None)
+    assert router.report()["models"]["champion"]["errors"] == 1
+
+
+def test_shadow_drops_requests_beyond_the_backlog(mode):
+    mode("shadow", max_shadow_backlog=1)
+    gate = threading.Event()
+    router = ModelRouter(FakePipeline([50.0]), FakePipeline([53.0], gate=gate))
+
+    # The first shadow call blocks on the gate, so the second finds the backlog full
+    assert router.predict(None) == [50.0]
+    assert router.predict(None) == [50.0]
+    gate.set()
+    router._executor.shutdown(wait=True)
+
+    shadow = router.report()["shadow"]
+    assert shadow["dropped"] == 1
+    assert shadow["compared"] == 1
+    assert shadow["mean_delta"] == pytest.approx(3.0)
+
+
+def test_warm_loads_both_pickle_and_single_row_models(mode):
+    mode("shadow")
+    champion = FakePipeline()
+
+    ModelRouter(champion)
+
+    assert champion.loaded == [None, 1]
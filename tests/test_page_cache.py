@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+flask = pytest.importorskip("flask")
+
+from src.page_cache import PageCache
+
+
+@pytest.fixture
+def site(tmp_path):
+    (tmp_path / "static.html").write_text("static page")
+    (tmp_path / "board.html").write_text("{{ count }} predictions")
+    os.utime(tmp_path / "static.html", (1_700_000_000, 1_700_000_000))
+
+    app = flask.Flask(__name__, template_folder=str(tmp_path))
+    state = {"version": 0, "cache": PageCache()}
+
+    @app.route("/static-page")
+    def static_page():
+        return state["cache"].response("static.html")
+
+    @app.route("/board")
+    def board():
+        version = state["version"]
+        return state["cache"].response("board.html", version=version, context=lambda: {"count": version})
+
+    @app.route("/missing")
+    def missing():
+        return state["cache"].response("static.html", status=404)
+
+    return app.test_client(), state, tmp_path
+
+
+def test_static_page_revalidates_to_304(site):
+    client, _, _ = site
+    first = client.get("/static-page")
+    assert first.status_code == 200 and first.data == b"static page"
+
+    assert client.get("/static-page", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    assert client.get("/static-page", headers={"If-Modified-Since": first.headers["Last-Modified"]}).status_code == 304
+
+
+def test_static_last_modified_comes_from_the_template(site):
+    client, state, _ = site
+    first = client.get("/static-page").headers["Last-Modified"]
+    # A fresh cache stands in for another worker or a restart
+    state["cache"] = PageCache()
+    second = client.get("/static-page").headers["Last-Modified"]
+
+    assert first == second == "Tue, 14 Nov 2023 22:13:20 GMT"
+
+
+def test_edited_template_is_rendered_again(site):
+    client, _, tmp_path = site
+    etag = client.get("/static-page").headers["ETag"]
+    (tmp_path / "static.html").write_text("edited page")
+    os.utime(tmp_path / "static.html", (1_800_000_000, 1_800_000_000))
+
+    response = client.get("/static-page", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.data == b"edited page"
+
+
+def test_versioned_page_goes_stale_when_the_version_moves(site):
+    client, state, _ = site
+    first = client.get("/board")
+    assert first.data == b"0 predictions"
+    assert "Last-Modified" not in first.headers
+    assert client.get("/board", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    state["version"] = 1
+    response = client.get("/board", headers={"If-None-Match": first.headers["ETag"]})
+    assert response.status_code == 200 and response.data == b"1 predictions"
+
+
+def test_error_pages_are_never_304(site):
+    client, _, _ = site
+    etag = client.get("/static-page").headers["ETag"]
+
+    response = client.get("/missing", headers={"If-None-Match": etag})
+    assert response.status_code == 404 and response.data == b"static page"
+    assert "ETag" not in response.headers
@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+from src.pipeline.predict_pipeline import CustomData
+
+
+def test_sweep_grid_is_row_major_in_field_order():
+    base = CustomData(
+        gender="female",
+        race_ethnicity="group B",
+        parental_level_of_education="some college",
+        lunch="standard",
+        test_preparation_course="none",
+        reading_score=70.0,
+        writing_score=80.0,
+    )
+
+    df = base.get_sweep_data_frame({"reading_score": [10.0, 20.0], "lunch": ["standard", "free/reduced", "x"]})
+
+    assert list(df.columns) == list(base.get_data_as_data_frame().columns)
+    assert list(zip(df["reading_score"], df["lunch"])) == [
+        (10.0, "standard"), (10.0, "free/reduced"), (10.0, "x"),
+        (20.0, "standard"), (20.0, "free/reduced"), (20.0, "x"),
+    ]
+    # Fields that are not swept keep the base record's values
+    assert (df["gender"] == "female").all() and (df["writing_score"] == 80.0).all()
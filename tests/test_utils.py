@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.metrics import r2_score
+
+from src.utils import SharedDataset, fit_with_early_stopping
+
+
+def test_gradient_boosting_stops_growing_after_patience():
+    rng = np.random.RandomState(0)
+    X = rng.uniform(size=(400, 3))
+    y = X[:, 0] * 10 + rng.normal(scale=0.5, size=400)
+    X_train, X_val, y_train, y_val = X[:300], X[300:], y[:300], y[300:]
+
+    model = GradientBoostingRegressor(learning_rate=0.5, random_state=0)
+    best_rounds, score = fit_with_early_stopping(model, X_train, y_train, X_val, y_val, max_rounds=256, patience=5)
+
+    # Training itself stopped, not just the scoring
+    assert len(model.estimators_) == best_rounds + 5 < 256
+    staged = list(model.staged_predict(X_val))
+    assert score == pytest.approx(r2_score(y_val, staged[best_rounds - 1]))
+
+
+def test_shared_dataset_falls_back_when_shm_is_full(monkeypatch):
+    usage = namedtuple("usage", "total used free")
+    monkeypatch.setattr(shutil, "disk_usage", lambda path: usage(64, 64, 0))
+
+    with SharedDataset(X=np.ones((10, 2))) as dataset:
+        assert os.path.dirname(dataset.dir_path) == tempfile.gettempdir()
+        np.testing.assert_array_equal(dataset.attach()["X"], np.ones((10, 2)))
+    assert not os.path.exists(dataset.dir_path)
+
+
+def test_shared_dataset_cleans_up_partial_writes(monkeypatch):
+    created = []
+    real_mkdtemp = tempfile.mkdtemp
+
+    def mkdtemp(**kwargs):
+        created.append(real_mkdtemp(**kwargs))
+        return created[-1]
+
+    def save(path, array):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(tempfile, "mkdtemp", mkdtemp)
+    monkeypatch.setattr(np, "save", save)
+
+    with pytest.raises(OSError):
+        SharedDataset(X=np.ones(4), y=np.ones(4))
+    assert created and not os.path.exists(created[0])